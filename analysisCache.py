@@ -0,0 +1,97 @@
+'''
+analysisCache.py
+Shares the TextBlob work (tokens, POS tags) for a tweet between every
+Feature that needs it, instead of each feature building its own TextBlob.
+'''
+
+import collections
+
+class TweetAnalysis:
+    '''
+    TweetAnalysis: tokens and POS tags of one tweet, computed at most once
+    Attributes:
+        text: raw text of the tweet
+        tweetId: id of the tweet, used as the tag store key
+        tagStore: optional tagStore.TagStore that tags are read from and saved to
+        tokens: list of TextBlob tokens
+        tags: list of (word, tag) tuples
+    Can be passed anywhere a TextBlob is expected by the features in
+    dataStructures (tokens, tags and split()).
+    '''
+    def __init__(self, text, tweetId=None, tagStore=None):
+        self.text = text
+        self.tweetId = tweetId
+        self.tagStore = tagStore
+        self._blob = None
+        self._tokens = None
+        self._tags = None
+
+    # TextBlob (and NLTK behind it) is only imported once a tweet needs it
+    @property
+    def blob(self):
+        if self._blob is None:
+            from textblob import TextBlob
+            self._blob = TextBlob(self.text)
+        return self._blob
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = list(self.blob.tokens)
+        return self._tokens
+
+    @property
+    def tags(self):
+        if self._tags is None:
+            useStore = self.tagStore is not None and self.tweetId is not None
+            if useStore:
+                self._tags = self.tagStore.get(self.tweetId, self.text)
+            if self._tags is None:
+                self._tags = list(self.blob.tags)
+                if useStore:
+                    self.tagStore.put(self.tweetId, self.text, self._tags)
+        return self._tags
+
+    def split(self):
+        return self.text.split()
+
+class AnalysisCache:
+    '''
+    AnalysisCache: size-bounded LRU cache of TweetAnalysis objects keyed by text
+    Attributes:
+        maxsize: most analyses kept before the least recently used is dropped
+        tagStore: optional tagStore.TagStore shared by every analysis
+        hits: number of lookups answered from the cache
+        misses: number of lookups that created a new analysis
+    '''
+    def __init__(self, maxsize=10000, tagStore=None):
+        self.maxsize = maxsize
+        self.tagStore = tagStore
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Returns the TweetAnalysis for text, creating it if needed. tweetId is only
+    # used as the tag store key when the analysis is created.
+    def analyze(self, text, tweetId=None):
+        analysis = self._entries.get(text)
+        if analysis is not None:
+            self.hits += 1
+            self._entries.move_to_end(text)
+            return analysis
+        self.misses += 1
+        analysis = TweetAnalysis(text, tweetId=tweetId, tagStore=self.tagStore)
+        self._entries[text] = analysis
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return analysis
+
+    # Returns the TweetAnalysis for a Tweet object
+    def get(self, tweet):
+        return self.analyze(tweet.rawText, tweetId=tweet.id)
+
+    def clear(self):
+        self._entries.clear()
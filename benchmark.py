@@ -0,0 +1,237 @@
+'''
+benchmark.py
+Times the whole pipeline on synthetic corpora (syntheticCorpus) of several
+sizes: loading, every Feature in dataStructures, the tweetScanner pass against
+the Feature classes it replaces, vectorization and every model in
+classifier.MODELS. The memory held by the loaded corpus is measured with
+tracemalloc. Results are saved as JSON, and a later run can
+be compared against them to catch performance regressions.
+
+Usage:
+    python benchmark.py run results.json [num_users,num_users,...] [tweets_per_user] [workers] [baseline.json]
+    python benchmark.py compare baseline.json results.json [tolerance]
+'''
+
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import analysisCache
+import classifier
+import dataStructures
+import problemset3
+import syntheticCorpus
+import tweetScanner
+
+BENCHMARK_SIZES = (50, 200)
+
+# Timings shorter than this are too noisy to count as a regression
+MIN_SECONDS = 0.01
+
+# Returns a folder holding a synthetic corpus of the given size, generating
+# it under cache_folder the first time
+def corpus_folder(cache_folder, num_users, tweets_per_user, seed=0):
+    folder = os.path.join(cache_folder, 'corpus_{0}_{1}_{2}'.format(num_users, tweets_per_user, seed))
+    done = os.path.join(folder, '.complete')
+    if not os.path.exists(done):
+        syntheticCorpus.generate_corpus(folder, num_users, tweets_per_user, seed)
+        open(done, 'w').close()
+    return folder
+
+# Returns (seconds, result): the fastest of repeat calls of func, and the
+# result of the last call
+def best_time(func, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+# Returns (current, peak): megabytes of Python memory held once load_data
+# has read the corpus in folder, and the most held while it ran
+def load_memory(folder):
+    tracemalloc.start()
+    try:
+        users = problemset3.load_data(folder)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current / 2.0 ** 20, peak / 2.0 ** 20
+
+# Returns the Feature classes that can run in a FeaturePipeline, by name
+def pipeline_features():
+    return sorted((cls for cls in dataStructures.Feature.registry.values()
+                   if cls.LEVEL is not None and cls.__module__ == 'dataStructures'),
+                  key=lambda cls: cls.__name__)
+
+# Returns the values of feature for users: one per user for user level
+# features, one per tweet for tweet and text level features
+def evaluate_feature(feature, users):
+    if feature.LEVEL == 'user':
+        return feature.batchValues(users)
+    # A fresh analysis cache, so text features pay for their own TextBlob work
+    analyses = analysisCache.AnalysisCache()
+    values = []
+    for user in users:
+        for tweet in user.tweets:
+            values.append(feature(tweet if feature.LEVEL == 'tweet' else analyses.get(tweet)).getValue())
+    return values
+
+# Returns the counts tweetScanner replaces, one Feature class at a time
+def separate_counts(users):
+    return dict((key, evaluate_feature(feature, users)) for key, feature in tweetScanner.SCANNED_FEATURES.items())
+
+# Input:
+# folder = corpus folder.
+# repeat = number of runs of every step; the fastest counts.
+# workers = number of processes for loading and the pipeline.
+# Returns:
+# (timings, errors, memory): dictionaries of step name to seconds, of step
+# name to error message for steps that failed (e.g. missing NLTK data), and
+# of measurement name to megabytes.
+def benchmark_corpus(folder, repeat=3, workers=1):
+    timings = {}
+    errors = {}
+    memory = {}
+
+    # Measured in this process, before anything else is loaded
+    memory['load:current'], memory['load:peak'] = load_memory(folder)
+
+    timings['load'], users = best_time(lambda: problemset3.load_data(folder, workers=workers), repeat)
+    users = [user for user in users if user.tweets]
+
+    for feature in pipeline_features():
+        step = 'feature:' + feature.__name__
+        try:
+            timings[step], values = best_time(lambda: evaluate_feature(feature, users), repeat)
+        except Exception as e:
+            errors[step] = '{0}: {1}'.format(type(e).__name__, e)
+
+    # The single-pass scanner against one pass per Feature class it replaces
+    timings['scan:features'], counts = best_time(lambda: separate_counts(users), repeat)
+    timings['scan:tweetScanner'], counts = best_time(lambda: [tweetScanner.scan_user(user) for user in users], repeat)
+
+    timings['vectorize:pipeline'], X = best_time(
+        lambda: problemset3.make_pipeline(analysisCache.AnalysisCache()).transform(users, workers=workers), repeat)
+    dicts = [problemset3.make_pipeline(analysisCache.AnalysisCache()).userDict(user) for user in users]
+    half = len(users) // 2
+    timings['vectorize:dictvectorizer'], vectors = best_time(lambda: classifier.vectorize(dicts[:half], dicts[half:]),
+                                                             repeat)
+
+    y = np.asarray([classifier.GENDER_LABELS.index(user.gender) for user in users])
+    for name in sorted(classifier.MODELS):
+        step = 'model:' + name
+        try:
+            timings[step], result = best_time(
+                lambda: classifier.fit_predict(name, classifier.MODELS[name](), X[:half], y[:half], X[half:]), repeat)
+        except Exception as e:
+            errors[step] = '{0}: {1}'.format(type(e).__name__, e)
+    return timings, errors, memory
+
+# Input:
+# sizes = numbers of users of the corpora.
+# tweets_per_user = number of tweets of every user.
+# repeat = number of runs of every step; the fastest counts.
+# workers = number of processes for loading and the pipeline.
+# cache_folder = folder the corpora are generated in (default a temporary one).
+# Returns:
+# Dictionary with the run settings, and timings, errors and memory use per
+# corpus size.
+def run_benchmarks(sizes=BENCHMARK_SIZES, tweets_per_user=100, repeat=3, workers=1, cache_folder=None):
+    if cache_folder is None:
+        cache_folder = tempfile.mkdtemp(prefix='benchmark_')
+    results = {
+        'created': time.time(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'tweets_per_user': tweets_per_user,
+        'repeat': repeat,
+        'workers': workers,
+        'timings': {},
+        'errors': {},
+        'memory': {},
+    }
+    for num_users in sizes:
+        folder = corpus_folder(cache_folder, num_users, tweets_per_user)
+        timings, errors, memory = benchmark_corpus(folder, repeat, workers)
+        results['timings'][str(num_users)] = timings
+        results['errors'][str(num_users)] = errors
+        results['memory'][str(num_users)] = memory
+    return results
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+def load_results(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+# Input:
+# baseline, current = results from run_benchmarks or load_results.
+# tolerance = allowed slowdown, as a fraction of the baseline time.
+# Returns:
+# List of (size, step, baseline seconds, current seconds) for every step
+# that got slower by more than tolerance.
+def compare(baseline, current, tolerance=0.25):
+    regressions = []
+    for size, timings in sorted(current['timings'].items()):
+        old_timings = baseline['timings'].get(size, {})
+        for step, seconds in sorted(timings.items()):
+            old = old_timings.get(step)
+            if old is None or max(old, seconds) < MIN_SECONDS:
+                continue
+            if seconds > old * (1 + tolerance):
+                regressions.append((size, step, old, seconds))
+    return regressions
+
+def print_results(results):
+    print('{0:<8}{1:<44}{2:>12}'.format('users', 'step', 'seconds'))
+    for size, timings in sorted(results['timings'].items(), key=lambda item: int(item[0])):
+        for step, seconds in sorted(timings.items()):
+            print('{0:<8}{1:<44}{2:>12.4f}'.format(size, step, seconds))
+        for step, error in sorted(results['errors'].get(size, {}).items()):
+            print('{0:<8}{1:<44}{2:>12}  {3}'.format(size, step, 'failed', error))
+    if results.get('memory'):
+        print('{0:<8}{1:<44}{2:>12}'.format('users', 'memory', 'MB'))
+        for size, memory in sorted(results['memory'].items(), key=lambda item: int(item[0])):
+            for name, megabytes in sorted(memory.items()):
+                print('{0:<8}{1:<44}{2:>12.2f}'.format(size, name, megabytes))
+
+def print_regressions(regressions):
+    for size, step, old, seconds in regressions:
+        print('REGRESSION {0} users {1}: {2:.4f}s -> {3:.4f}s ({4:+.0%})'.format(
+            size, step, old, seconds, seconds / old - 1))
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('run', 'compare'):
+        print(__doc__)
+        sys.exit(1)
+    if sys.argv[1] == 'run':
+        sizes = [int(size) for size in sys.argv[3].split(',')] if len(sys.argv) > 3 else BENCHMARK_SIZES
+        tweets_per_user = int(sys.argv[4]) if len(sys.argv) > 4 else 100
+        workers = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+        results = run_benchmarks(sizes, tweets_per_user, workers=workers)
+        save_results(results, sys.argv[2])
+        print_results(results)
+        if len(sys.argv) > 6:
+            regressions = compare(load_results(sys.argv[6]), results)
+            print_regressions(regressions)
+            sys.exit(1 if regressions else 0)
+    else:
+        tolerance = float(sys.argv[4]) if len(sys.argv) > 4 else 0.25
+        regressions = compare(load_results(sys.argv[2]), load_results(sys.argv[3]), tolerance)
+        print_regressions(regressions)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -7,20 +7,36 @@ It takes four parameters as input:
     b(np.array) = ground truth of features(associated class)
     c(list) = test data which is dictionay of features
     d(np.array) = ground truth of test data 
+
+a and c can be any iterable of feature dictionaries, or feature matrices
+(e.g. from featurePipeline), which are used as they are instead of being
+vectorized again.
 '''
 
+def vectorize(a,c):
+
+   # Feature matrices (NumPy arrays, SciPy sparse matrices) are already vectorized
+   if hasattr(a,'shape'):
+      return a, c
+
+   # A dict is one sample; anything else (list, tuple, generator) holds samples
+   a = [a] if isinstance(a,dict) else list(a)
+   c = [c] if isinstance(c,dict) else list(c)
+
+   from sklearn.feature_extraction import DictVectorizer
+   v1 = DictVectorizer().fit(a+c)
+   return v1.transform(a), v1.transform(c)
+
+
 def get_SVM_Acc(a,b,c,d):
 
    # Convert features into vector of numbers
-   from sklearn.feature_extraction import DictVectorizer   
-   v1 = DictVectorizer().fit(a+c) 
-  
+   X_data_tr, X_data_ts = vectorize(a,c)
+
    #define training data
-   X_data_tr = v1.transform(a)
    Y_data_tr = b
    
    #define test data
-   X_data_ts = v1.transform(c)
    Y_data_ts = d
 
    #import linear SVM   
@@ -40,15 +56,12 @@ def get_SVM_Acc(a,b,c,d):
 def get_Naivebayes_Acc(a,b,c,d):
 
    # Convert features into vector of numbers
-   from sklearn.feature_extraction import DictVectorizer   
-   v1 = DictVectorizer().fit(a+c) 
-  
+   X_data_tr, X_data_ts = vectorize(a,c)
+
    #define training data
-   X_data_tr = v1.transform(a)
    Y_data_tr = b
    
    #define test data
-   X_data_ts = v1.transform(c)
    Y_data_ts = d
 
    #import Naive bayes classifier   
@@ -70,15 +83,12 @@ def get_Naivebayes_Acc(a,b,c,d):
 def get_LinearRegression_Acc(a,b,c,d):
 
    # Convert features into vector of numbers
-   from sklearn.feature_extraction import DictVectorizer   
-   v1 = DictVectorizer().fit(a+c) 
-  
+   X_data_tr, X_data_ts = vectorize(a,c)
+
    #define training data
-   X_data_tr = v1.transform(a)
    Y_data_tr = b
    
    #define test data
-   X_data_ts = v1.transform(c)
    Y_data_ts = d
 
 
@@ -100,40 +110,192 @@ def get_LinearRegression_Acc(a,b,c,d):
 
    return acc
    
-def get_LinearRegression_Acc(a,b,c,d):
 
-   # Convert features into vector of numbers
-   from sklearn.feature_extraction import DictVectorizer   
-   v1 = DictVectorizer().fit(a+c) 
-  
-   #define training data
-   X_data_tr = v1.transform(a)
-   Y_data_tr = b
-   
-   #define test data
-   X_data_ts = v1.transform(c)
-   Y_data_ts = d
+'''
+Model comparison:
+Vectorizes a and c once and fits every registered model on the same
+matrices, optionally several at a time in threads (the sklearn solvers
+release the GIL while fitting).
+'''
 
+def _svm():
+   from sklearn.svm import LinearSVC
+   return LinearSVC()
 
-   #import Linear Regression classifier   
-   import numpy as np
+def _naivebayes():
+   from sklearn.naive_bayes import MultinomialNB
+   return MultinomialNB()
+
+def _linearregression():
    from sklearn import linear_model
-   regr = linear_model.LinearRegression()
-   regr.fit(X_data_tr,Y_data_tr)
-   
-   #Use trained model to classify test data
-   Y_pred = regr.predict(X_data_ts)
-   # Convert into nearest integer 
-   Y_pred = np.rint(Y_pred)
+   return linear_model.LinearRegression()
 
-   acc = (Y_pred==Y_data_ts).mean()
-   
-   #from sklearn.metrics import confusion_matrix
-   #print(confusion_matrix(Y_data_ts,Y_pred))
+def _sgd():
+   from sklearn.linear_model import SGDClassifier
+   return SGDClassifier()
 
-   return acc
+# Registered models: name -> function returning a new unfitted estimator
+MODELS = {
+   'svm': _svm,
+   'naivebayes': _naivebayes,
+   'linearregression': _linearregression,
+   'sgd': _sgd,
+}
 
+# Models whose continuous predictions are rounded to the nearest integer class
+ROUNDED_MODELS = set(['linearregression'])
 
+# Models that can be trained batch by batch with partial_fit
+INCREMENTAL_MODELS = set(['sgd','naivebayes'])
+
+def fit_predict(name,model,X_data_tr,Y_data_tr,X_data_ts):
+
+   import time
+   import numpy as np
+
+   start = time.time()
+   model.fit(X_data_tr,Y_data_tr)
+   fit_time = time.time() - start
+
+   start = time.time()
+   Y_pred = model.predict(X_data_ts)
+   if name in ROUNDED_MODELS:
+      Y_pred = np.rint(Y_pred)
+   predict_time = time.time() - start
+
+   return model, Y_pred, fit_time, predict_time
+
+def compare_models(a,b,c,d,models=None,workers=1):
+
+   '''
+   Returns a list with one dictionary per model:
+      model, accuracy, fit_time and predict_time (seconds)
+   models(list) = names from MODELS, default all classifiers ('svm', 'naivebayes')
+   workers(int) = number of models fitted at the same time
+   '''
+   import numpy as np
+
+   if models is None:
+      models = ['svm','naivebayes']
+
+   # Convert features into vector of numbers, once for every model
+   X_data_tr, X_data_ts = vectorize(a,c)
+   Y_data_tr = np.asarray(b)
+   Y_data_ts = np.asarray(d)
+
+   # Models are created here so sklearn is imported before any thread starts
+   estimators = dict((name, MODELS[name]()) for name in models)
+
+   def run(name):
+      model, Y_pred, fit_time, predict_time = fit_predict(name,estimators[name],X_data_tr,Y_data_tr,X_data_ts)
+      acc = (Y_pred==Y_data_ts).mean()
+      return {'model': name, 'accuracy': acc, 'fit_time': fit_time, 'predict_time': predict_time}
+
+   if workers > 1:
+      from concurrent.futures import ThreadPoolExecutor
+      with ThreadPoolExecutor(max_workers=workers) as executor:
+         return list(executor.map(run, models))
+   return [run(name) for name in models]
+
+def print_model_table(rows):
+
+   print('{0:<18}{1:>10}{2:>12}{3:>14}'.format('model','accuracy','fit (s)','predict (s)'))
+   for row in rows:
+      print('{0:<18}{1:>10.3f}{2:>12.4f}{3:>14.4f}'.format(row['model'],row['accuracy'],row['fit_time'],row['predict_time']))
+
+
+'''
+Output files:
+Predictions are turned into labels with lookup tables (gender, education)
+or bin edges (age) over whole arrays, and all requested outputs are
+written in one pass over the users, a chunk of lines per write call.
+'''
+
+# Label of every predicted class, indexed by the prediction
+GENDER_LABELS = ['Male','Female']
+EDUCATION_LABELS = ['high_school','some_college','graduate']
+
+# Age group by predicted birth year: before 1978, 1978 up to (not including)
+# 1988, and 1988 or later
+AGE_BIN_EDGES = [1978,1988]
+AGE_LABELS = ['>=36','26-35','<=25']
+
+# Number of users written per write call
+OUTPUT_CHUNK = 100000
+
+def labels_for(filename,Y_pred):
+
+   '''
+   Returns an array with the label of every prediction for filename
+   ('gender', 'age' or 'education'). Class predictions without a label
+   get an empty string. Predictions that are already labels (any
+   non-numeric array, e.g. ['Male','Female']) are returned as strings.
+   '''
+   import numpy as np
+
+   if filename not in ('gender','age','education'):
+      raise ValueError('unknown output file {0}'.format(filename))
+   Y_pred = np.asarray(Y_pred)
+   if not np.issubdtype(Y_pred.dtype,np.number):
+      return Y_pred.astype(str).astype(object)
+   if filename == 'age':
+      return np.asarray(AGE_LABELS,dtype=object)[np.digitize(Y_pred,AGE_BIN_EDGES)]
+   if filename == 'gender':
+      table = np.asarray(GENDER_LABELS,dtype=object)
+   else:
+      table = np.asarray(EDUCATION_LABELS,dtype=object)
+   labels = np.full(len(Y_pred),'',dtype=object)
+   known = (Y_pred >= 0) & (Y_pred < len(table)) & (Y_pred == np.floor(Y_pred))
+   labels[known] = table[Y_pred[known].astype(np.int64)]
+   return labels
+
+def write_predictions(usrnames,predictions,folder='.',compress=False,columnar=False):
+
+   '''
+   Writes the predictions of every user in one pass.
+      usrnames(list) = usernames of the test data
+      predictions(dict) = 'gender', 'age' and/or 'education' -> Y_pred
+      compress(bool) = write gzip files (filename.txt.gz)
+      columnar(bool) = write one compressed NumPy file, predictions.npz,
+                       with a 'user' array and one label array per output
+   Returns the list of files written.
+   '''
+   import gzip
+   import os
+   import numpy as np
+
+   labels = dict((filename, labels_for(filename,Y_pred)) for filename, Y_pred in predictions.items())
+   for filename in labels:
+      if len(labels[filename]) != len(usrnames):
+         raise ValueError('{0} has {1} predictions for {2} users'.format(filename,len(labels[filename]),len(usrnames)))
+
+   if columnar:
+      path = os.path.join(folder,'predictions.npz')
+      arrays = dict((filename, values.astype(str)) for filename, values in labels.items())
+      np.savez_compressed(path,user=np.asarray([str(u) for u in usrnames]),**arrays)
+      return [path]
+
+   paths = []
+   files = []
+   for filename in labels:
+      path = os.path.join(folder,filename+'.txt')
+      if compress:
+         path += '.gz'
+         files.append(gzip.open(path,'wt'))
+      else:
+         files.append(open(path,'w',buffering=1 << 20))
+      paths.append(path)
+   try:
+      for start in range(0,len(usrnames),OUTPUT_CHUNK):
+         names = [str(u) for u in usrnames[start:start+OUTPUT_CHUNK]]
+         for f, filename in zip(files,labels):
+            chunk = labels[filename][start:start+OUTPUT_CHUNK]
+            f.write('\n'.join(map('\t'.join,zip(names,chunk))))
+            f.write('\n')
+   finally:
+      for f in files:
+         f.close()
+   return paths
 
 '''
     Function to generate output files(.txt)
@@ -144,52 +306,8 @@ def get_LinearRegression_Acc(a,b,c,d):
 '''
 
 def createTextFiles(usrnames,Y_pred,filename):
-    if filename == 'gender':
-        file_name = filename+'.txt'
-        file1 = open(file_name,'w')
-        for i in range(0,len(Y_pred)):
-            file1.write(str(usrnames[i]))
-            file1.write("\t")
-            if Y_pred[i]==0:
-                file1.write('Male')
-            elif Y_pred[i]==1:
-                file1.write('Female')
-            file1.write("\n")
-        
-        file1.close()
+    write_predictions(usrnames,{filename: Y_pred})
     
-    elif filename == 'education':
-        file_name = filename+ '.txt'
-        file1 = open(file_name,'w')
-        for i in range(0,len(Y_pred)):
-            file1.write(str(usrnames[i]))
-            file1.write("\t")
-            if Y_pred[i]==0:
-                file1.write('high_school')
-            elif Y_pred[i]==1:
-                file1.write('some_college')
-            elif Y_pred[i]==2:
-                file1.write('graduate')
-            file1.write("\n")
-        file1.close()
-        
-    elif filename == 'age':
-        file_name = filename+ '.txt'
-        file1 = open(file_name,'w')
-        for i in range(0,len(Y_pred)):
-            file1.write(str(usrnames[i]))
-            file1.write("\t")
-            if Y_pred[i]>=1988:
-                file1.write('<=25')
-            elif (Y_pred[i]>=1978 and Y_pred[i]<=1987):
-                file1.write('26-35')
-            elif Y_pred[i]<=1977:
-                file1.write('>=36')
-            file1.write("\n")
-        file1.close()
-        
-
-   
 '''
 Example:-
    
@@ -203,6 +321,14 @@ d1 = Y_data[900:]
 
 acc = get_SVM_Acc(a1,b1,c1,d1)
 
+Stratified k-fold scores instead of a single split (folds in 4 processes):
+
+import crossValidation
+from sklearn.feature_extraction import DictVectorizer
+X = DictVectorizer().fit_transform(feature_dict)
+results = crossValidation.cross_validate(X, Y_data, models=['svm'], k=5, workers=4)
+crossValidation.print_report(results)
+
 
 Example to generate .txt files: 
 
@@ -213,6 +339,10 @@ Y_pred_edu = [1,0,1,2,0,1,2,0,1,2]
 
 createTextFiles(usrname_temp,Y_pred_edu,'education')
 
+All three files in one pass (gzip compressed):
+
+write_predictions(usrname_temp,{'gender': Y_pred_gen, 'age': Y_pred_age, 'education': Y_pred_edu},compress=True)
+
    
    
 '''
@@ -0,0 +1,269 @@
+'''
+corpusCache.py
+Compiles a data folder of per-user pickles into a single columnar cache and
+reads Users back out of it through memory-mapped arrays.
+
+Cache layout (all arrays are .npy files, one entry per tweet unless noted):
+    timestamps, num_tokens, num_punctuation
+    tweet_ids: int64 tweet ids, if every id is an int that fits
+    id_offsets: otherwise n+1 byte offsets into ids.bin
+    text_offsets, token_offsets: n+1 byte offsets into text.bin / tokens.bin
+    user_offsets: one entry per user plus one, index of each user's first tweet
+    ids.bin: utf-8 tweet ids as strings, back to back
+    text.bin: utf-8 tweet texts back to back
+    tokens.bin: utf-8 tokens, separated by TOKEN_SEPARATOR
+    manifest.pickl: version, id type, user ids, user.pickl contents and
+                    absolute lazy file paths
+'''
+
+import array
+import mmap
+import os
+import pickle
+import sys
+
+import dataStructures
+
+CACHE_VERSION = 2
+MANIFEST_FILE = 'manifest.pickl'
+TOKEN_SEPARATOR = '\x1f'
+
+# Range of the int64 tweet_ids column
+_MIN_ID = -2 ** 63
+_MAX_ID = 2 ** 63 - 1
+
+# Returns True if tweet_id can be kept in the int64 tweet_ids column
+def _is_int_id(tweet_id):
+    return isinstance(tweet_id, int) and not isinstance(tweet_id, bool) and _MIN_ID <= tweet_id <= _MAX_ID
+
+# Input:
+# folder = string, folder that may hold a compiled corpus.
+# Returns:
+# True if folder holds a compiled corpus cache.
+def is_compiled(folder):
+    return os.path.isfile(os.path.join(folder, MANIFEST_FILE))
+
+# Input:
+# data_folder = string, per-user pickle folder as read by problemset3.load_data.
+# cache_folder = string, folder the compiled cache is written to.
+# workers = number of processes used to read the user folders.
+# Returns:
+# Number of users written. Users are streamed, so memory use stays flat.
+# Tweet ids come back as they were loaded if they are all ints that fit in
+# int64; otherwise every id is kept, and comes back, as a string.
+def compile_corpus(data_folder, cache_folder, workers=1):
+    import numpy as np
+    import problemset3
+
+    if not os.path.isdir(cache_folder):
+        os.makedirs(cache_folder)
+    # An old manifest would make a half-rewritten cache look compiled
+    if is_compiled(cache_folder):
+        os.remove(os.path.join(cache_folder, MANIFEST_FILE))
+
+    tweet_ids = array.array('q')
+    id_offsets = array.array('q', [0])
+    int_ids = True
+    timestamps = array.array('d')
+    num_tokens = array.array('q')
+    num_punctuation = array.array('q')
+    text_offsets = array.array('q', [0])
+    token_offsets = array.array('q', [0])
+    user_offsets = array.array('q', [0])
+    users = []
+
+    with open(os.path.join(cache_folder, 'text.bin'), 'wb') as text_file, \
+            open(os.path.join(cache_folder, 'tokens.bin'), 'wb') as tokens_file, \
+            open(os.path.join(cache_folder, 'ids.bin'), 'wb') as ids_file:
+        for user in problemset3.iter_users(data_folder, workers=workers):
+            for tweet in user.tweets:
+                text = tweet.rawText.encode('utf-8')
+                tokens = TOKEN_SEPARATOR.join(tweet.tokens).encode('utf-8')
+                text_file.write(text)
+                tokens_file.write(tokens)
+                # Ids are written as strings too, in case a later one is
+                # not an int64
+                tweet_id = str(tweet.id).encode('utf-8')
+                ids_file.write(tweet_id)
+                id_offsets.append(id_offsets[-1] + len(tweet_id))
+                if int_ids and _is_int_id(tweet.id):
+                    tweet_ids.append(tweet.id)
+                else:
+                    int_ids = False
+                timestamps.append(tweet.timestamp)
+                num_tokens.append(tweet.numTokens)
+                num_punctuation.append(tweet.numPunctuation)
+                text_offsets.append(text_offsets[-1] + len(text))
+                token_offsets.append(token_offsets[-1] + len(tokens))
+            user_offsets.append(len(timestamps))
+            users.append({
+                'id': user.id,
+                'userInfo': user.userInfo,
+                'ngrams': _lazy_path(user._ngrams),
+                'replacements': _lazy_path(user._replacements),
+                'transforms': _lazy_path(user._transforms),
+            })
+            user.evict()
+
+    columns = {
+        'timestamps': timestamps,
+        'num_tokens': num_tokens,
+        'num_punctuation': num_punctuation,
+        'text_offsets': text_offsets,
+        'token_offsets': token_offsets,
+        'user_offsets': user_offsets,
+    }
+    if int_ids:
+        columns['tweet_ids'] = tweet_ids
+        os.remove(os.path.join(cache_folder, 'ids.bin'))
+    else:
+        columns['id_offsets'] = id_offsets
+    for name, values in columns.items():
+        np.save(os.path.join(cache_folder, name + '.npy'), np.frombuffer(values, dtype=values.typecode))
+
+    # Manifest goes last so a half-written cache is never picked up.
+    with open(os.path.join(cache_folder, MANIFEST_FILE), 'wb') as f:
+        pickle.dump({'version': CACHE_VERSION, 'int_ids': int_ids, 'users': users}, f)
+    return len(users)
+
+# Returns the absolute file path behind a LazyPickle, or None. Absolute, so
+# the cache can be opened from any working directory.
+def _lazy_path(value):
+    if isinstance(value, dataStructures.LazyPickle):
+        return os.path.abspath(value.path)
+    return None
+
+class CompiledCorpus:
+    '''
+    CompiledCorpus: read-only view of a compiled corpus cache
+    Attributes:
+        folder: cache folder
+        users: list of per-user manifest entries
+        int_ids: True if tweet ids are ints from the tweet_ids column, False
+                 if they are strings from ids.bin
+    Arrays are memory-mapped, so opening a corpus reads almost nothing.
+    '''
+    def __init__(self, folder):
+        import numpy as np
+        self.folder = folder
+        with open(os.path.join(folder, MANIFEST_FILE), 'rb') as f:
+            manifest = pickle.load(f)
+        if manifest['version'] != CACHE_VERSION:
+            raise ValueError('corpus cache {0} has version {1}, expected {2}; recompile it'.format(
+                folder, manifest['version'], CACHE_VERSION))
+        self.users = manifest['users']
+        self.int_ids = manifest['int_ids']
+
+        def load(name):
+            return np.load(os.path.join(folder, name + '.npy'), mmap_mode='r')
+        if self.int_ids:
+            self.tweet_ids = load('tweet_ids')
+        else:
+            self.id_offsets = load('id_offsets')
+            self.ids = self._map_blob('ids.bin')
+        self.timestamps = load('timestamps')
+        self.num_tokens = load('num_tokens')
+        self.num_punctuation = load('num_punctuation')
+        self.text_offsets = load('text_offsets')
+        self.token_offsets = load('token_offsets')
+        self.user_offsets = load('user_offsets')
+        self.text = self._map_blob('text.bin')
+        self.tokens = self._map_blob('tokens.bin')
+
+    # Only the folder is pickled; worker processes re-open the memory maps
+    def __getstate__(self):
+        return {'folder': self.folder}
+
+    def __setstate__(self, state):
+        self.__init__(state['folder'])
+
+    def _map_blob(self, name):
+        with open(os.path.join(self.folder, name), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b''
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.users)
+
+    def __iter__(self):
+        for index in range(len(self.users)):
+            yield self.user(index)
+
+    # Returns the id of the tweet at position index
+    def tweetId(self, index):
+        if self.int_ids:
+            return int(self.tweet_ids[index])
+        return self.ids[self.id_offsets[index]:self.id_offsets[index + 1]].decode('utf-8')
+
+    # Builds the Tweet at position index of the tweet columns. Tokens are a
+    # tuple, as from problemset3.load_user.
+    def tweet(self, index):
+        text = self.text[self.text_offsets[index]:self.text_offsets[index + 1]].decode('utf-8')
+        tokens = self.tokens[self.token_offsets[index]:self.token_offsets[index + 1]].decode('utf-8')
+        return dataStructures.Tweet(id=self.tweetId(index),
+                                    tokens=tuple(tokens.split(TOKEN_SEPARATOR)) if tokens else (),
+                                    timestamp=float(self.timestamps[index]),
+                                    rawText=text,
+                                    numTokens=int(self.num_tokens[index]),
+                                    numPunctuation=int(self.num_punctuation[index]))
+
+    # Builds the User at position index; its tweets are read on access
+    def user(self, index):
+        entry = self.users[index]
+        tweets = CachedTweets(self, int(self.user_offsets[index]), int(self.user_offsets[index + 1]))
+        user = dataStructures.User(id=entry['id'], tweets=tweets, userInfo=entry['userInfo'],
+                                   ngrams=_lazy_handle(entry['ngrams']),
+                                   replacements=_lazy_handle(entry['replacements']),
+                                   transforms=_lazy_handle(entry['transforms']))
+        if entry['userInfo'] is not None:
+            for key, value in entry['userInfo'].items():
+                setattr(user, key.lower(), value)
+        return user
+
+# Returns a LazyPickle for path, or None if there was no file
+def _lazy_handle(path):
+    if path is None:
+        return None
+    return dataStructures.LazyPickle(path)
+
+class CachedTweets:
+    '''
+    CachedTweets: sequence of one user's tweets backed by a CompiledCorpus
+    Attributes:
+        corpus: CompiledCorpus the tweets live in
+        start: index of the first tweet in the corpus columns
+        stop: index one past the last tweet
+    Tweet objects are built on access and not kept.
+    '''
+    def __init__(self, corpus, start, stop):
+        self.corpus = corpus
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __iter__(self):
+        for index in range(self.start, self.stop):
+            yield self.corpus.tweet(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('tweet index out of range')
+        return self.corpus.tweet(self.start + index)
+
+    # The timestamp column for this user, without building Tweet objects
+    def timestamps(self):
+        return self.corpus.timestamps[self.start:self.stop]
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print('usage: python corpusCache.py data_folder cache_folder [workers]')
+        sys.exit(1)
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    print(compile_corpus(sys.argv[1], sys.argv[2], workers=workers))
@@ -0,0 +1,165 @@
+'''
+crossValidation.py
+Stratified k-fold cross-validation over an extracted feature matrix. Every
+(model, fold) pair is fitted in a pool of worker processes. The matrix is
+written once to a temporary folder and memory-mapped by each worker, so it is
+never pickled per fold; a task only carries its fold's row indices.
+'''
+
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import scipy.sparse
+
+import classifier
+import parallel
+
+# Matrix and labels shared by the folds run in this process
+_SHARED = {}
+
+# Input:
+# labels = list or array with the class of every row.
+# k = number of folds.
+# seed = seed of the shuffle before the rows are dealt into folds.
+# Returns:
+# List of k (train_indices, test_indices) pairs. Every class is spread over
+# the folds in proportion to its size.
+def stratified_folds(labels, k=5, seed=0):
+    from sklearn.model_selection import StratifiedKFold
+    labels = np.asarray(labels)
+    splitter = StratifiedKFold(n_splits=k, shuffle=True, random_state=seed)
+    return list(splitter.split(np.zeros(len(labels)), labels))
+
+# Writes the arrays of a CSR matrix to folder, for _open_shared
+def _dump_matrix(X, folder):
+    X = scipy.sparse.csr_matrix(X)
+    np.save(os.path.join(folder, 'data.npy'), X.data)
+    np.save(os.path.join(folder, 'indices.npy'), X.indices)
+    np.save(os.path.join(folder, 'indptr.npy'), X.indptr)
+    return X.shape
+
+# Pool initializer: memory-maps the matrix written by _dump_matrix
+def _open_shared(folder, shape, labels, seed=None):
+    arrays = [np.load(os.path.join(folder, name + '.npy'), mmap_mode='r')
+              for name in ('data', 'indices', 'indptr')]
+    _SHARED['X'] = scipy.sparse.csr_matrix(tuple(arrays), shape=shape, copy=False)
+    _SHARED['y'] = labels
+    _SHARED['seed'] = seed
+
+# Returns estimator with its random_state set to seed, if it has one (e.g.
+# LinearSVC and SGDClassifier), so every fold is fitted the same way each run
+def _seeded(estimator, seed):
+    if seed is not None and 'random_state' in estimator.get_params():
+        estimator.set_params(random_state=seed)
+    return estimator
+
+# Input:
+# task = (model name, fold number, train indices, test indices, params), where
+#        params is a dictionary passed to the estimator's set_params.
+# Returns:
+# Dictionary with model, params, fold, accuracy, fit_time and predict_time.
+def _run_fold(task):
+    name, fold, train, test, params = task
+    X, y = _SHARED['X'], _SHARED['y']
+    estimator = _seeded(classifier.MODELS[name](), _SHARED.get('seed'))
+    if params:
+        estimator.set_params(**params)
+    model, Y_pred, fit_time, predict_time = classifier.fit_predict(name, estimator, X[train], y[train], X[test])
+    return {'model': name, 'params': params, 'fold': fold, 'accuracy': (Y_pred == y[test]).mean(),
+            'fit_time': fit_time, 'predict_time': predict_time}
+
+class SharedMatrix:
+    '''
+    SharedMatrix: a feature matrix shared by many fold fits
+    Attributes:
+        matrix: the feature matrix as a CSR matrix
+        folder: temporary folder the matrix arrays are saved in, written the
+                first time folds run in worker processes and removed by close()
+    Keeping one SharedMatrix open across several runFolds calls (e.g. the
+    trials of a hyperparameter search) writes the matrix only once.
+    '''
+    def __init__(self, X):
+        self.matrix = scipy.sparse.csr_matrix(X)
+        self.folder = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.folder is not None:
+            shutil.rmtree(self.folder, ignore_errors=True)
+            self.folder = None
+
+    # Input:
+    # tasks = list of (model name, fold number, train, test, params) tuples.
+    # labels = array with the class of every row.
+    # workers = number of worker processes; 1 or less runs every fold here.
+    # seed = random_state given to the estimators that take one; params
+    #        setting random_state override it.
+    # Returns:
+    # Generator of _run_fold results in task order. Closing it early stops
+    # handing out tasks, which is how a time budget cuts a run short.
+    def runFolds(self, tasks, labels, workers=1, seed=None):
+        if workers is None or workers <= 1:
+            _SHARED['X'], _SHARED['y'], _SHARED['seed'] = self.matrix, labels, seed
+            try:
+                for task in tasks:
+                    yield _run_fold(task)
+            finally:
+                _SHARED.clear()
+            return
+        if self.folder is None:
+            self.folder = tempfile.mkdtemp(prefix='cv_')
+            _dump_matrix(self.matrix, self.folder)
+        for row in parallel.ordered_imap(_run_fold, tasks, workers=workers,
+                                         initializer=_open_shared,
+                                         initargs=(self.folder, self.matrix.shape, labels, seed)):
+            yield row
+
+# Input:
+# X = feature matrix, one row per user (e.g. from FeaturePipeline.transform).
+# labels = class of every row.
+# models = names from classifier.MODELS, default ['svm', 'naivebayes'].
+# k = number of folds.
+# workers = number of worker processes; 1 or less runs every fold here.
+# seed = seed of the fold assignment and of the estimators that take a
+#        random_state, so runs are repeatable.
+# Returns:
+# List with one dictionary per model: model, folds (list of per-fold
+# dictionaries from _run_fold), mean and std of the fold accuracies, and
+# wall_time, the seconds taken by the whole run.
+def cross_validate(X, labels, models=None, k=5, workers=1, seed=0):
+    if models is None:
+        models = ['svm', 'naivebayes']
+    labels = np.asarray(labels)
+    folds = stratified_folds(labels, k, seed)
+    tasks = [(name, fold, train, test, {}) for name in models for fold, (train, test) in enumerate(folds)]
+
+    start = time.time()
+    with SharedMatrix(X) as shared:
+        rows = list(shared.runFolds(tasks, labels, workers, seed))
+    wall_time = time.time() - start
+
+    results = []
+    for name in models:
+        fold_rows = [row for row in rows if row['model'] == name]
+        scores = np.array([row['accuracy'] for row in fold_rows])
+        results.append({'model': name, 'folds': fold_rows, 'mean': scores.mean(),
+                        'std': scores.std(), 'wall_time': wall_time})
+    return results
+
+def print_report(results):
+    print('{0:<18}{1:>6}{2:>10}{3:>12}{4:>14}'.format('model', 'fold', 'accuracy', 'fit (s)', 'predict (s)'))
+    for result in results:
+        for row in result['folds']:
+            print('{0:<18}{1:>6}{2:>10.3f}{3:>12.4f}{4:>14.4f}'.format(
+                row['model'], row['fold'], row['accuracy'], row['fit_time'], row['predict_time']))
+        print('{0:<18}{1:>6}{2:>10.3f} +/- {3:.3f}'.format(result['model'], 'mean', result['mean'], result['std']))
+    if results:
+        print('wall time {0:.2f}s'.format(results[0]['wall_time']))
@@ -4,12 +4,60 @@ Defines the User, Tweet, and Feature classes we will be using
 '''
 
 import re
-from textblob import TextBlob
 import string
-from nltk.corpus import wordnet
-from nltk.corpus import stopwords
 import datetime
 import math
+import pickle
+
+import lexicons
+import spelling
+
+# Patterns shared by the features, compiled once at import
+MENTION_PATTERN = re.compile(r'@[A-z]+')
+HASHTAG_PATTERN = re.compile(r'#([a-zA-Z0-9]+)')
+EMOTICON_PATTERN = re.compile(r':\)|:\(|:D|:\'\)|=\)|:O|:P|B\)')
+MULTI_TWEET_PATTERN = re.compile(r'^\(([0-9]+) of ([0-9]+)\)') # Matches: ^(X of Y)
+RETWEET_PATTERN = re.compile(r'(RT|retweet|from|via)(?:\b\W*@(\w+))+')
+
+class LazyPickle:
+    '''
+    LazyPickle: handle to a pickle file that is only unpickled on first access
+    Attributes:
+        path: path of the pickle file
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._value = None
+        self._loaded = False
+
+    # Unpickles the file the first time it is called, then returns the cached value
+    def load(self):
+        if not self._loaded:
+            with open(self.path, 'rb') as f:
+                self._value = pickle.load(f)
+            self._loaded = True
+        return self._value
+
+    # Drops the cached value so it is read from disk again on next access
+    def evict(self):
+        self._value = None
+        self._loaded = False
+
+    def isLoaded(self):
+        return self._loaded
+
+    # Only the path travels between processes, never the unpickled data
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+# Returns value itself, or the unpickled data if value is a LazyPickle
+def _resolve(value):
+    if isinstance(value, LazyPickle):
+        return value.load()
+    return value
 
 class User:
     '''
@@ -17,9 +65,9 @@ class User:
     Attributes:
         id: string of root folder.
         tweets: list of Tweet objects
-        ngrams: dictionary of ngrams
-        replacements: dictionary of replacements
-        transforms: dictionary of transforms
+        ngrams: dictionary of ngrams (may be given as a LazyPickle)
+        replacements: dictionary of replacements (may be given as a LazyPickle)
+        transforms: dictionary of transforms (may be given as a LazyPickle)
         month: String birthMonth
         regions: List of regions they claim
         languages: List of strings of languages
@@ -29,23 +77,58 @@ class User:
         education: String of education
         year: int of birth year
     '''
-    def __init__(self, id="", tweets=[], ngrams={}, replacements={}, transforms={}, userInfo={}, month="", regions=[], languages=[], gender="", occupation="", astrology="", education="", year=0):
+    def __init__(self, id="", tweets=None, ngrams=None, replacements=None, transforms=None, userInfo=None, month="", regions=None, languages=None, gender="", occupation="", astrology="", education="", year=0):
+        # None defaults get a fresh container per User instead of one shared
+        # mutable default.
         self.id = id
-        self.tweets = tweets
-        self.ngrams = ngrams
-        self.replacements = replacements
-        self.transforms = transforms
-        self.userInfo = userInfo
+        self.tweets = tweets if tweets is not None else []
+        self.ngrams = ngrams if ngrams is not None else {}
+        self.replacements = replacements if replacements is not None else {}
+        self.transforms = transforms if transforms is not None else {}
+        self.userInfo = userInfo if userInfo is not None else {}
 
         self.month = month
-        self.regions = regions
-        self.languages = languages
+        self.regions = regions if regions is not None else []
+        self.languages = languages if languages is not None else []
         self.gender = gender
         self.occupation = occupation
         self.astrology = astrology
         self.education = education
         self.year = year
 
+    # ngrams, replacements and transforms are unpickled on first access when
+    # they were handed in as LazyPickle objects.
+    @property
+    def ngrams(self):
+        return _resolve(self._ngrams)
+
+    @ngrams.setter
+    def ngrams(self, value):
+        self._ngrams = value
+
+    @property
+    def replacements(self):
+        return _resolve(self._replacements)
+
+    @replacements.setter
+    def replacements(self, value):
+        self._replacements = value
+
+    @property
+    def transforms(self):
+        return _resolve(self._transforms)
+
+    @transforms.setter
+    def transforms(self, value):
+        self._transforms = value
+
+    # Frees any lazily loaded ngrams/replacements/transforms; they are read
+    # from disk again if accessed later.
+    def evict(self):
+        for value in (self._ngrams, self._replacements, self._transforms):
+            if isinstance(value, LazyPickle):
+                value.evict()
+
 class Tweet:
     '''
     Tweet: defines a single tweet by a user
@@ -56,9 +139,12 @@ class Tweet:
         rawText: raw text of the tweet
         numTokens: the number of tokens
         numPunctuation: the number of punctation characters in the tweet
+    Tweets use __slots__ since a corpus holds millions of them; this saves the
+    per-instance __dict__.
     '''
+    __slots__ = ('id', 'tokens', 'timestamp', 'rawText', 'numTokens', 'numPunctuation')
 
-    def __init__(self, id=0, tokens=[], timestamp=0, rawText='', numTokens=0, numPunctuation=0):
+    def __init__(self, id=0, tokens=(), timestamp=0, rawText='', numTokens=0, numPunctuation=0):
         self.id = id
         self.tokens = tokens
         self.timestamp = timestamp
@@ -71,9 +157,51 @@ class Feature:
     Feature: defines a generic feature
     Attributes: None
     '''
+    # What the constructor takes: 'user' (a User), 'tweet' (a Tweet) or 'text'
+    # (a TextBlob or analysisCache.TweetAnalysis of one tweet). featurePipeline
+    # sums tweet and text level values over a user's tweets.
+    LEVEL = None
+
+    # Bump when a feature's definition changes, so featureStore recomputes it
+    VERSION = 1
+
+    # Names of the lexicons getValue reads; featurePipeline loads them before
+    # starting workers, which then share the parent's copy
+    LEXICONS = ()
+
+    # Every Feature subclass by class name
+    registry = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        Feature.registry[cls.__name__] = cls
+
     def __init__(self):
         pass
 
+    # Returns getValue() for each user-level feature of users. Features that
+    # can be computed for many users at once override this.
+    @classmethod
+    def batchValues(cls, users):
+        return [cls(user).getValue() for user in users]
+
+    # Starts timing every registered Feature's calls and returns the
+    # featureProfiler.FeatureProfiler collecting them. While profiling is
+    # disabled the features run unwrapped, at no extra cost.
+    @staticmethod
+    def enableProfiling(profiler=None):
+        import featureProfiler
+        return (profiler or featureProfiler.FeatureProfiler()).enable()
+
+    # Stops timing Feature calls. Returns the profiler that was enabled, if any.
+    @staticmethod
+    def disableProfiling():
+        import featureProfiler
+        profiler = featureProfiler.ACTIVE
+        if profiler is not None:
+            profiler.disable()
+        return profiler
+
     # Return the feature name for storage in the features dictionary
     def getKey(self):
         return ''
@@ -90,6 +218,8 @@ class CapitalizationFeature(Feature):
     '''
     CapitalizationFeature: counts the number of capital letters for a tweet
     '''
+    LEVEL = 'tweet'
+
     def __init__(self, tweet):
         self.tweet = tweet
 
@@ -104,6 +234,8 @@ class AverageTweetLengthFeature(Feature):
     '''
     AverageTweetLength: counts the average length of the user's tweets
     '''
+    LEVEL = 'user'
+
     def __init__(self, user):
         self.user = user
 
@@ -124,6 +256,8 @@ class NumberOfTimesOthersMentionedFeature(Feature):
     NumberOfTimesOthersMentionedFeature: counts the number of times the user
     mentions someone else in their tweets
     '''
+    LEVEL = 'user'
+
     def __init__(self, user):
         self.user = user
 
@@ -132,15 +266,16 @@ class NumberOfTimesOthersMentionedFeature(Feature):
 
     def getValue(self):
         val = 0
-        comp_regex = re.compile('@[A-z]+')
         for tweet in self.user.tweets:
-            val += len(re.findall(comp_regex, tweet.rawText))
+            val += len(MENTION_PATTERN.findall(tweet.rawText))
         return val
 
 class POSTagging(Feature):
 	'''
 	POSTagging: returns Part of Speech tagging for the tweet
 	'''
+	LEVEL = 'text';
+
 	def __init__(self, tweetTB):
 		self.tweetTB = tweetTB;
 
@@ -154,6 +289,8 @@ class CountPersonalReferences(Feature):
 	'''
 	CountPersonalReferences: Counts the number of Personal References used
 	'''
+	LEVEL = 'text';
+	LEXICONS = ('personal_references',);
 
 	def __init__(self, tweetTB):
 		self.tweetTB = tweetTB;
@@ -164,7 +301,7 @@ class CountPersonalReferences(Feature):
 	def getValue(self):
 		listOfWords = list(self.tweetTB.tokens);
 		count = 0;
-		listOfPR = ['I','he','she','we','you','they'];
+		listOfPR = lexicons.get('personal_references');
 		for word in listOfWords:
 			if word in listOfPR:
 				count += 1;
@@ -174,6 +311,7 @@ class CountPunctuations(Feature):
 	'''
 	CountPunctuations: Counts the number of Punctuations
 	'''
+	LEVEL = 'text';
 
 	def __init__(self, tweetTB):
 		self.tweetTB = tweetTB;
@@ -194,6 +332,7 @@ class CountHashTags(Feature):
 	'''
 	CountHashTags: Counts the number of HashTags in the tweet
 	'''
+	LEVEL = 'text';
 
 	def __init__(self, tweetTB):
 		self.tweetTB = tweetTB;
@@ -202,7 +341,7 @@ class CountHashTags(Feature):
 		return 'CountHashTags';
 
 	def getValue(self):
-		pattern = re.compile('#([a-zA-Z0-9]+)');
+		pattern = HASHTAG_PATTERN;
 		count = 0;
 		listOfWords = self.tweetTB.split();
 		for word in listOfWords:
@@ -214,6 +353,7 @@ class CountEmoticon(Feature):
 	'''
 	CountEmoticon:: Counts the number of emoticons in the tweet
 	'''
+	LEVEL = 'text';
 
 	def __init__(self, tweetTB):
 		self.tweetTB = tweetTB;
@@ -222,7 +362,7 @@ class CountEmoticon(Feature):
 		return 'CountEmoticon';
 
 	def getValue(self):
-		pattern = re.compile(':\)|:\(|:D|:\'\)|=\)|:O|:P|B\)');
+		pattern = EMOTICON_PATTERN;
 		count = 0;
 		posTagList = self.tweetTB.tags;
 		for (word,tag) in posTagList:
@@ -234,6 +374,8 @@ class CountEmotionalWords(Feature):
 	'''
 	CountEmotionalWords: Counts the number of emotional words in the tweet
 	'''
+	LEVEL = 'text';
+	LEXICONS = ('emotional',);
 
 	def __init__(self, tweetTB):
 		self.tweetTB = tweetTB;
@@ -242,8 +384,7 @@ class CountEmotionalWords(Feature):
 		return 'CountEmotionalWords';
 
 	def getValue(self):
-		file = open('EmotionalWords.txt','r');
-		listOfWords = [word.lower() for word in (file.read()).split(',')];
+		listOfWords = lexicons.get('emotional');
 		count = 0;
 		for (word,tag) in self.tweetTB.tags:
 			if word in listOfWords:
@@ -254,6 +395,8 @@ class CountMisspelledWords(Feature):
 	'''
 	CountMisspelledWords: Counts the number of misspelled words in the tweet
 	'''
+	LEVEL = 'text';
+	LEXICONS = ('stopwords', 'wordnet_lemmas');
 
 	def __init__(self,tweetTB):
 		self.tweetTB = tweetTB;
@@ -262,33 +405,40 @@ class CountMisspelledWords(Feature):
 		return 'CountMisspelledWords';
 
 	def getValue(self):
-		count = 0;
-		stopwordList = stopwords.words('english');
-		for (word,tag) in self.tweetTB.tags:
-			if not wordnet.synsets(word) and word.lower() not in stopwordList and tag != 'SYM':
-				count += 1;
-		return count;
+		return spelling.DETECTOR.countMisspelled(self.tweetTB.tags);
 
 class FrequencyOfTweetingFeature(Feature):
     '''
     FrequencyOfTweetingFeature: Builds histogram broken into times when user tweeted
     Returns: dictionary of features with how many times the user tweeted in that interval
+    For whole corpora, timeHistogram.time_of_day_features computes the same
+    dictionaries for every user in one NumPy pass.
     '''
+    LEVEL = 'user'
+    MINUTE_INTERVAL = 30.0 # The default size of the histogram buckets in minutes
+    TIMESTAMP_DIVISOR = 100 # Tweet timestamps are in hundredths of a second
 
-    MINUTE_INTERVAL = 30.0 # The size of the histogram buckets in minutes
-
-    def __init__(self, user):
+    def __init__(self, user, minute_interval=None):
         self.user = user
+        self.minute_interval = float(minute_interval or self.MINUTE_INTERVAL)
 
+    # The default interval keeps the original key; other intervals get their own
     def getKey(self):
-        return 'FrequencyOfTweetingFeature'
+        if self.minute_interval == self.MINUTE_INTERVAL:
+            return 'FrequencyOfTweetingFeature'
+        return 'FrequencyOfTweetingFeature{0:g}min'.format(self.minute_interval)
+
+    # Number of buckets in a day, e.g. 48 for 30 min interval
+    def numBuckets(self):
+        return int(math.ceil((24*60)/self.minute_interval))
 
     def getValue(self):
-        time_vector = [0] * int((24*60)/self.MINUTE_INTERVAL) # e.g. 48 for 30 min interval
+        time_vector = [0] * self.numBuckets()
         for tweet in self.user.tweets:
-            time = datetime.datetime.utcfromtimestamp(tweet.timestamp/100)
+            time = datetime.datetime.utcfromtimestamp(tweet.timestamp/self.TIMESTAMP_DIVISOR)
             time_in_min = time.hour*60 + time.minute
-            index_in_time = math.floor(time_in_min/self.MINUTE_INTERVAL) - 1
+            # Bucket 0 starts at midnight
+            index_in_time = int(math.floor(time_in_min/self.minute_interval))
             time_vector[index_in_time] += 1
         # Convert vector to dictionary
         time_dict = {}
@@ -296,52 +446,102 @@ class FrequencyOfTweetingFeature(Feature):
             time_dict[self.getKey() + '_{0}'.format(x)] = time_vector[x]
         return time_dict
 
+    # All users' histograms at the default interval in one vectorized pass
+    @classmethod
+    def batchValues(cls, users):
+        import timeHistogram
+        return timeHistogram.time_of_day_features(users, (cls.MINUTE_INTERVAL,))
+
 class NumberOfMultiTweetsFeature(Feature):
     '''
     NumberOfMultiTweetsFeature: Counts the number of multi-tweet tweets for the user
     Note: Counts number of *complete* multi-tweets as 1
+    A "(X of Y)" tweet joins the first thread of size Y that is still missing
+    part X, otherwise it starts a new thread. So the k-th "(X of Y)" tweet always
+    lands in the k-th thread of size Y, and counting tweets per (Y, X) in a hash
+    map is enough to rebuild every thread in O(n).
+    Attributes:
+        user: User to evaluate
+        max_gap: optional largest timestamp gap between consecutive multi-tweets
+                 of one thread; tweets further apart start separate threads
     '''
-    def __init__(self, user):
+    LEVEL = 'user'
+
+    def __init__(self, user, max_gap=None):
         self.user = user
+        self.max_gap = max_gap
 
     def getKey(self):
         return 'NumberOfMultiTweetsFeature'
 
-    def getValue(self):
-        multi_tweets = []
-        num_complete_multi_tweets = 0
-        pattern = re.compile('^\(([0-9]+) of ([0-9]+)\)') # Matches: ^(X of Y)
-
+    # Returns list of (timestamp, part, total) for every valid "(X of Y)" tweet
+    def _parts(self):
+        parts = []
         for tweet in self.user.tweets:
-            match = pattern.match(tweet.rawText)
+            match = MULTI_TWEET_PATTERN.match(tweet.rawText)
             if match:
-                placed = False
-                tweet_num = match.group(1)
-                of_tweet = match.group(2)
-
-                # Search and see if there is a multi-tweet of the same size missing our number
-                for multi_tweet in multi_tweets:
-                    if len(multi_tweet) == of_tweet and not multi_tweet[tweet_num]:
-                        multi_tweet[tweet_num] = True
-                        placed = True
-                        break
-                # No existing multi-tweet for this tweet, make a new multi-tweet
-                if not placed:
-                    multi_tweet = [False] * of_tweet
-                    multi_tweet[tweet_num] = True
-                    multi_tweets.append(multi_tweet)
-
-        for multi_tweet in multi_tweets:
-            # If all of the mutli-tweet is True, it is a complete multi-tweet
-            if sum(multi_tweet) == len(multi_tweet):
-                num_complete_multi_tweets += 1
-
-        return num_complete_multi_tweets
+                tweet_num = int(match.group(1))
+                of_tweet = int(match.group(2))
+                if 1 <= tweet_num <= of_tweet:
+                    parts.append((tweet.timestamp, tweet_num, of_tweet))
+        return parts
+
+    # Splits the parts into groups that threads may not cross. Without max_gap
+    # everything is one group; otherwise a gap larger than max_gap starts a new one.
+    def _sessions(self, parts):
+        if self.max_gap is None or not parts:
+            return [parts]
+        parts = sorted(parts)
+        sessions = [[parts[0]]]
+        for previous, part in zip(parts, parts[1:]):
+            if part[0] - previous[0] > self.max_gap:
+                sessions.append([])
+            sessions[-1].append(part)
+        return sessions
+
+    # Returns a list of (size, parts_seen, complete) tuples, one per thread
+    def getThreads(self):
+        threads = []
+        for session in self._sessions(self._parts()):
+            # counts[size][part] = how many "(part of size)" tweets were seen
+            counts = {}
+            for (timestamp, tweet_num, of_tweet) in session:
+                size_counts = counts.setdefault(of_tweet, {})
+                size_counts[tweet_num] = size_counts.get(tweet_num, 0) + 1
+            for of_tweet, size_counts in counts.items():
+                # Thread k holds every part seen at least k times
+                num_threads = max(size_counts.values())
+                lengths = [0] * num_threads
+                for part_count in size_counts.values():
+                    for k in range(part_count):
+                        lengths[k] += 1
+                for length in lengths:
+                    threads.append((of_tweet, length, length == of_tweet))
+        return threads
+
+    def getValue(self):
+        return sum(1 for (size, length, complete) in self.getThreads() if complete)
+
+    # Returns dictionary of thread-level statistics alongside the count
+    def getStats(self):
+        threads = self.getThreads()
+        num_threads = len(threads)
+        num_complete = sum(1 for (size, length, complete) in threads if complete)
+        num_parts = sum(length for (size, length, complete) in threads)
+        return {
+            self.getKey(): num_complete,
+            self.getKey() + '_threads': num_threads,
+            self.getKey() + '_completionRate': float(num_complete) / num_threads if num_threads else 0.0,
+            self.getKey() + '_averageLength': float(num_parts) / num_threads if num_threads else 0.0,
+        }
 
 class CountCategoricalWords(Feature):
     '''
     CountCategoricalWords : Counts the number of categorical words in the tweet
     '''
+    LEVEL = 'tweet'
+    LEXICONS = ('categorical',)
+
     def __init__(self,tweet):
         self.tweet = tweet;
 
@@ -349,18 +549,19 @@ class CountCategoricalWords(Feature):
         return 'CountCategoricalWords';
 
     def getValue(self):
-        categoricalWordsList = ['help','acheive','success','dreams','goals',
-                                'career','beer','alcohol','sex','football',
-                                'esteem','ego','pride','gym'];
+        categoricalWordsList = lexicons.get('categorical');
         wordsList = self.tweet.rawText.split(" ");
         count = 0;
         for word in wordsList:
             if word in categoricalWordsList:
                 count += 1;
         return count;
-<<<<<<< HEAD
 
 class CountRetweet(Feature):
+    '''
+    CountRetweet: counts the number of retweets from a user
+    '''
+    LEVEL = 'user'
 
     def __init__(self, user):
         self.user = user
@@ -368,37 +569,18 @@ class CountRetweet(Feature):
     def getKey(self):
         return 'RetweetCount'
 
-=======
- 
- 
-class CountRetweet(Feature):
-	
-	#It will give the number of retweets from a user.
-    def __init__(self, user):
-        self.user = user
-        
-    def getKey(self):
-        return 'RetweetCount'
-        
->>>>>>> 4681b6738366f9344c1f2fc1ffd7684844cf8bea
     def getValue(self):
         count = 0
-        pattern = re.compile('(RT|retweet|from|via)(?:\b\W*@(\w+))+')
         for tweet in self.user.tweets:
-            count += len(re.findall(pattern,tweet.rawText))
+            count += len(RETWEET_PATTERN.findall(tweet.rawText))
         return count 
 
-<<<<<<< HEAD
-
-
-
-
-
-=======
 class CountLanguageUsed(Feature):
 	'''
 	CountLanguageUsed : Counts the number of languages the user knows
 	'''
+	LEVEL = 'user';
+
 	def __init__(self,user):
 		self.user = user;
 		
@@ -412,6 +594,8 @@ class CountRegions(Feature):
 	'''
 	CountRegions : Counts the number of regions visited by the user
 	'''
+	LEVEL = 'user';
+
 	def __init__(self,user):
 		self.user = user;
 	
@@ -420,4 +604,3 @@ class CountRegions(Feature):
 		
 	def getValue(self):
 		return len(self.user.regions);
->>>>>>> 4681b6738366f9344c1f2fc1ffd7684844cf8bea
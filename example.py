@@ -1,15 +1,29 @@
+import tempfile
+
 from dataStructures import *
+import problemset3
+import syntheticCorpus
 
-# Data setup for example (because we don't have real tweets or users yet)
-tweet = Tweet()
-user = User()
+# Data setup for example: the real tweets aren't in the repo, so write a
+# small synthetic corpus in the load_data layout and load it
+data_folder = tempfile.mkdtemp()
+syntheticCorpus.generate_corpus(data_folder, num_users=5, tweets_per_user=20)
+users = [user for user in problemset3.load_data(data_folder) if user.tweets]
+user = users[0]
+tweet = user.tweets[0]
 
 # Add features to array
 f_objects = []
-f[0] = CapitalizationFeature(tweet)
-f[1] = AverageTweetLengthFeature(user)
+f_objects.append(CapitalizationFeature(tweet))
+f_objects.append(AverageTweetLengthFeature(user))
+f_objects.append(NumberOfTimesOthersMentionedFeature(user))
+f_objects.append(CountRetweet(user))
 
 # Generate features dictionary from features
 features = {}
 for f in f_objects:
     features[f.getKey()] = f.getValue()
+print(features)
+
+# The same features for every user at once, as used by problemset3.main
+print(problemset3.extract_user_features(user))
@@ -1,8 +1,9 @@
 from textblob import TextBlob
 import string
 import re
-from nltk.corpus import wordnet
-from nltk.corpus import stopwords
+
+import lexicons
+import spelling
 
 # Returns POS tagging of the tweet
 def posTagging(tweet):
@@ -50,8 +51,7 @@ def countEmoticon(tweet):
     
 # Returns count of Emotional Words in the tweet
 def countEmotionalWords(tweet):
-    file = open('EmotionalWords.txt','r');
-    listOfWords = [word.lower() for word in (file.read()).split(',')];
+    listOfWords = lexicons.get('emotional');
     count = 0;
     for (word,tag) in tweet.tags:
         if word in listOfWords:
@@ -60,12 +60,7 @@ def countEmotionalWords(tweet):
 
 # Returns count of Misspelled Words in the tweet
 def countMisspelledWords(tweet):
-    count = 0;
-    stopwordList = stopwords.words('english');
-    for (word,tag) in tweet.tags:
-        if not wordnet.synsets(word) and word.lower() not in stopwordList and tag != 'SYM':
-            count += 1;
-    return count;
+    return spelling.DETECTOR.countMisspelled(tweet.tags);
     
 # Main code
 line = "Heyyyy.. My Name is Chinmay!!!! I am so happy!!! That so gay.. :) =) #Name #Me #12";
@@ -0,0 +1,299 @@
+'''
+featurePipeline.py
+Runs a declared list of Feature classes over Users in batches and writes the
+values straight into a SciPy CSR matrix, with a stable column per feature key.
+'''
+
+import array
+import numbers
+import pickle
+
+import analysisCache
+import featureProfiler
+import lexicons
+import parallel
+import tagStore
+
+def _check_numeric(key, value):
+    if not isinstance(value, numbers.Number):
+        raise ValueError('feature {0} returned non-numeric value {1!r}'.format(key, value))
+
+# The FeaturePipeline of a worker process, set once by _init_worker
+_WORKER_PIPELINE = None
+
+# Pool initializer: installs the parent's lexicons and unpickles the pipeline
+# once per worker. The pipeline comes pickled whatever the start method, so
+# the worker always gets __setstate__'s fresh cache and read-only tag store.
+def _init_worker(pipeline_bytes, lexicon_snapshot):
+    global _WORKER_PIPELINE
+    lexicons.install(lexicon_snapshot)
+    _WORKER_PIPELINE = pickle.loads(pipeline_bytes)
+
+# Input:
+# users = list of User objects (one chunk).
+# Returns:
+# (rows, tags): the rows for the chunk, and the (tweet_id, text, tags) the
+# chunk added to the tag store, for the parent to write. Runs in worker
+# processes.
+def _chunk_rows(users):
+    pipeline = _WORKER_PIPELINE
+    tag_store = pipeline.analyses.tagStore
+    if tag_store is None:
+        return list(pipeline.iterRows(users)), []
+    try:
+        rows = list(pipeline.iterRows(users))
+    finally:
+        tag_store.close()
+    return rows, tag_store.takePending()
+
+# Returns the sum of a tweet or text level feature's values over a user's tweets
+def _total(key, values):
+    total = 0
+    for value in values:
+        _check_numeric(key, value)
+        total += value
+    return total
+
+class FeaturePipeline:
+    '''
+    FeaturePipeline: evaluates Feature classes for many users into one matrix
+    Attributes:
+        features: list of Feature classes (each with LEVEL 'user', 'tweet' or 'text')
+        columns: list of column names; column i of the matrix is columns[i]
+        frozen: if True no new columns are added and unknown keys are dropped,
+                so a fitted pipeline always produces the same width
+        analyses: AnalysisCache shared by the text level features
+        batchSize: number of users evaluated together
+        store: optional featureStore.FeatureStore; features of users whose
+               inputs and feature VERSION are unchanged are loaded from it
+    User-level features are evaluated through Feature.batchValues, so features
+    with a vectorized batch path (e.g. FrequencyOfTweetingFeature) use it.
+    Tweet and text level values are summed over each user's tweets.
+    '''
+    def __init__(self, features, columns=None, analyses=None, batchSize=256, store=None):
+        for feature in features:
+            if feature.LEVEL not in ('user', 'tweet', 'text'):
+                raise ValueError('{0} has no LEVEL and cannot be used in a FeaturePipeline'.format(feature.__name__))
+        self.features = list(features)
+        self.columns = list(columns) if columns is not None else []
+        self.columnIndex = dict((name, i) for i, name in enumerate(self.columns))
+        self.frozen = columns is not None
+        self.analyses = analyses if analyses is not None else analysisCache.AnalysisCache()
+        self.batchSize = batchSize
+        self.store = store
+
+    # The cached analyses are per process and are not sent to workers; each
+    # worker gets an empty cache of the same size that reads the same tag
+    # store read-only (new tags go back to the parent, see parallelRows)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        tag_store = self.analyses.tagStore
+        state['analyses'] = (self.analyses.maxsize, tag_store.path if tag_store is not None else None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        maxsize, tag_path = self.analyses
+        tag_store = tagStore.TagStore(tag_path, readOnly=True) if tag_path is not None else None
+        self.analyses = analysisCache.AnalysisCache(maxsize, tagStore=tag_store)
+
+    # Stops new columns from being added
+    def freeze(self):
+        self.frozen = True
+
+    # Returns the column of key, adding it unless the pipeline is frozen
+    def _column(self, key):
+        index = self.columnIndex.get(key)
+        if index is None and not self.frozen:
+            index = len(self.columns)
+            self.columnIndex[key] = index
+            self.columns.append(key)
+        return index
+
+    # Input:
+    # feature = Feature class to evaluate.
+    # users = list of User objects evaluated together.
+    # Returns:
+    # List with one list of (key, value) pairs per user.
+    def _evaluate(self, feature, users):
+        key = feature(None).getKey()
+        if feature.LEVEL == 'user':
+            pairs = []
+            for value in feature.batchValues(users):
+                if isinstance(value, dict):
+                    pairs.append(list(value.items()))
+                else:
+                    pairs.append([(key, value)])
+            return pairs
+        elif feature.LEVEL == 'tweet':
+            return [[(key, _total(key, (feature(tweet).getValue() for tweet in featureProfiler.track_user(user).tweets)))]
+                    for user in users]
+        else:
+            return [[(key, _total(key, (feature(self.analyses.get(tweet)).getValue()
+                                        for tweet in featureProfiler.track_user(user).tweets)))]
+                    for user in users]
+
+    # Input:
+    # users = list of User objects evaluated together.
+    # Returns:
+    # List with one row per user; a row is a list of (key, value) pairs. Tags
+    # the batch added to the tag store are committed.
+    def batchRows(self, users):
+        rows = self._batchRows(users)
+        if self.analyses.tagStore is not None:
+            self.analyses.tagStore.commit()
+        return rows
+
+    def _batchRows(self, users):
+        rows = [[] for user in users]
+        if self.store is None:
+            for feature in self.features:
+                for row, pairs in zip(rows, self._evaluate(feature, users)):
+                    row.extend(pairs)
+            return rows
+
+        # Users whose input files changed lose all their stored features
+        unchanged = [self.store.inputsUnchanged(user) for user in users]
+        for user, fresh in zip(users, unchanged):
+            if not fresh:
+                self.store.invalidate(user.id)
+        for feature in self.features:
+            cached = [self.store.load(user.id, feature) for user in users]
+            missing = [user for user, pairs in zip(users, cached) if pairs is None]
+            computed = iter(self._evaluate(feature, missing))
+            for row, user, pairs in zip(rows, users, cached):
+                if pairs is None:
+                    pairs = next(computed)
+                    self.store.save(user.id, feature, pairs)
+                row.extend(pairs)
+        for user, fresh in zip(users, unchanged):
+            if not fresh:
+                self.store.recordInputs(user)
+        self.store.commit()
+        return rows
+
+    # Input:
+    # users = list or iterator of User objects.
+    # Returns:
+    # Generator of rows (lists of (key, value) pairs), one per user, in order.
+    def iterRows(self, users):
+        batch = []
+        for user in users:
+            batch.append(user)
+            if len(batch) >= self.batchSize:
+                for row in self.batchRows(batch):
+                    yield row
+                batch = []
+        if batch:
+            for row in self.batchRows(batch):
+                yield row
+
+    # Returns the features of one user as a dictionary
+    def userDict(self, user):
+        return dict(self.batchRows([user])[0])
+
+    # Input:
+    # rows = iterable of rows as produced by iterRows.
+    # num_rows = number of rows, if known, so the row pointer is preallocated.
+    # Returns:
+    # scipy.sparse.csr_matrix with one row per input row and one column per
+    # entry of self.columns.
+    def rowsToMatrix(self, rows, num_rows=None):
+        import numpy as np
+        import scipy.sparse
+
+        data = array.array('d')
+        indices = array.array('i')
+        if num_rows is not None:
+            indptr = np.zeros(num_rows + 1, dtype=np.int64)
+        else:
+            indptr = array.array('q', [0])
+        count = 0
+        for row in rows:
+            for key, value in row:
+                _check_numeric(key, value)
+                # Columns are added even for zeros, so they follow feature order
+                index = self._column(key)
+                if index is not None and value:
+                    data.append(value)
+                    indices.append(index)
+            count += 1
+            if num_rows is not None:
+                indptr[count] = len(data)
+            else:
+                indptr.append(len(data))
+        if num_rows is None:
+            indptr = np.frombuffer(indptr, dtype=np.int64)
+        elif count != num_rows:
+            raise ValueError('expected {0} rows, got {1}'.format(num_rows, count))
+        matrix = scipy.sparse.csr_matrix((np.frombuffer(data, dtype=np.float64),
+                                          np.frombuffer(indices, dtype=np.int32),
+                                          indptr),
+                                         shape=(count, len(self.columns)))
+        matrix.sum_duplicates()
+        return matrix
+
+    # Input:
+    # users = list or iterator of User objects.
+    # workers = number of worker processes; 1 or less evaluates everything in
+    #           this process, which is the easiest mode to debug.
+    # chunkSize = number of users sent to a worker at a time (default batchSize).
+    # Returns:
+    # Generator of rows, one per user, in input order. Workers only read the
+    # tag store; the tags they compute are written and committed here, one
+    # chunk at a time.
+    def parallelRows(self, users, workers=1, chunkSize=None):
+        if workers is None or workers <= 1:
+            return self.iterRows(users)
+        chunks = _chunks(users, chunkSize or self.batchSize)
+        # Loaded here, before the snapshot, so no worker loads WordNet itself
+        lexicon_names = [name for feature in self.features for name in feature.LEXICONS]
+        results = parallel.ordered_imap(_chunk_rows, chunks, workers=workers, initializer=_init_worker,
+                                        initargs=(pickle.dumps(self), lexicons.REGISTRY.snapshot(lexicon_names)))
+        return self._saveTags(results)
+
+    # Writes the tags of every (rows, tags) result to the tag store and
+    # yields the rows
+    def _saveTags(self, results):
+        tag_store = self.analyses.tagStore
+        for rows, tags in results:
+            if tag_store is not None and tags:
+                for tweet_id, text, tweet_tags in tags:
+                    tag_store.put(tweet_id, text, tweet_tags)
+                tag_store.commit()
+            for row in rows:
+                yield row
+
+    # Input:
+    # users = list or iterator of User objects.
+    # workers = number of worker processes computing features (see parallelRows).
+    # chunkSize = number of users sent to a worker at a time.
+    # Returns:
+    # scipy.sparse.csr_matrix of features, one row per user in input order.
+    def transform(self, users, workers=1, chunkSize=None):
+        num_rows = len(users) if hasattr(users, '__len__') else None
+        return self.rowsToMatrix(self.parallelRows(users, workers, chunkSize), num_rows)
+
+# Returns a generator of lists of up to size items from items
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Input:
+# rows = iterable of rows as produced by FeaturePipeline.iterRows.
+# width = number of columns of the result.
+# Returns:
+# scipy.sparse.csr_matrix with one row per input row, each (key, value) pair
+# hashed into one of width columns. Unlike rowsToMatrix the width does not
+# depend on the keys seen, so batches from different runs line up.
+def hash_rows(rows, width):
+    from sklearn.feature_extraction import FeatureHasher
+    # Unsigned, so non-negative features stay non-negative (MultinomialNB)
+    hasher = FeatureHasher(n_features=width, input_type='pair', alternate_sign=False)
+    return hasher.transform(rows).tocsr()
@@ -0,0 +1,195 @@
+'''
+featureProfiler.py
+Per-feature timing. While a FeatureProfiler is enabled, getValue (and any
+batchValues override) of every class in dataStructures.Feature.registry is
+replaced by a timing wrapper; disable() puts the original methods back, so
+profiling costs nothing while it is off.
+
+For every getKey() it keeps the call count and each call's wall time, which
+gives cumulative time and percentiles, and it adds up the time spent on every
+user. Other stages, such as loading, can be timed with timeIterator. Features
+run in worker processes are not seen, so profile with one worker.
+'''
+
+import array
+import collections
+import json
+import marshal
+import time
+
+import dataStructures
+
+# The enabled profiler, if any
+ACTIVE = None
+
+# Percentiles shown by report() and written by toJSON()
+PERCENTILES = (50, 95, 99)
+
+# Tells the enabled profiler, if any, which user the next feature calls are for.
+# Tweet and text level features only see a tweet, so featurePipeline calls
+# this before evaluating each user's tweets. Returns user.
+def track_user(user):
+    if ACTIVE is not None:
+        ACTIVE.currentUser = user.id
+    return user
+
+def _timed_get_value(profiler, get_value):
+    def getValue(self):
+        start = time.perf_counter()
+        try:
+            return get_value(self)
+        finally:
+            elapsed = time.perf_counter() - start
+            user = getattr(self, 'user', None)
+            profiler.record(self.getKey(), elapsed, user.id if user is not None else profiler.currentUser)
+    getValue.__wrapped__ = get_value
+    return getValue
+
+def _timed_batch_values(profiler, key, batch_values):
+    def batchValues(cls, users):
+        users = list(users)
+        start = time.perf_counter()
+        try:
+            return batch_values(cls, users)
+        finally:
+            elapsed = time.perf_counter() - start
+            # A vectorized batch has no per-user cost; it is split evenly
+            share = elapsed / len(users) if users else 0.0
+            for user in users:
+                profiler.record(key, share, user.id)
+    batchValues.__wrapped__ = batch_values
+    return classmethod(batchValues)
+
+class FeatureProfiler:
+    '''
+    FeatureProfiler: wall time of Feature calls, by key and by user
+    Attributes:
+        samples: dictionary of key to array of seconds, one entry per call
+        userTimes: dictionary of user id to total seconds of the calls on that user
+        currentUser: user id tweet and text level calls are counted for
+    '''
+    def __init__(self):
+        self.samples = collections.defaultdict(lambda: array.array('d'))
+        self.userTimes = collections.defaultdict(float)
+        self.currentUser = None
+        self._originals = []
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    def record(self, key, seconds, user_id=None):
+        self.samples[key].append(seconds)
+        if user_id is not None:
+            self.userTimes[user_id] += seconds
+
+    # Wraps the methods of every registered Feature. Returns self.
+    def enable(self):
+        global ACTIVE
+        if ACTIVE is not None:
+            raise RuntimeError('a FeatureProfiler is already enabled')
+        for cls in list(dataStructures.Feature.registry.values()):
+            if 'getValue' in cls.__dict__:
+                original = cls.__dict__['getValue']
+                self._originals.append((cls, 'getValue', original))
+                cls.getValue = _timed_get_value(self, original)
+            if 'batchValues' in cls.__dict__:
+                original = cls.__dict__['batchValues']
+                self._originals.append((cls, 'batchValues', original))
+                cls.batchValues = _timed_batch_values(self, cls(None).getKey(), original.__func__)
+        ACTIVE = self
+        return self
+
+    # Restores the original methods; the collected timings are kept
+    def disable(self):
+        global ACTIVE
+        for cls, name, original in reversed(self._originals):
+            setattr(cls, name, original)
+        self._originals = []
+        if ACTIVE is self:
+            ACTIVE = None
+
+    # Input:
+    # key = name the time is recorded under, e.g. 'load_user'.
+    # items = iterator whose next() calls are timed.
+    # Returns:
+    # Generator of the same items. Time is counted for items with an id
+    # attribute (Users) as time spent on that user.
+    def timeIterator(self, key, items):
+        items = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            self.record(key, time.perf_counter() - start, getattr(item, 'id', None))
+            yield item
+
+    # Returns a dictionary of key to statistics: calls, total, mean, max and
+    # one entry per PERCENTILES (seconds)
+    def stats(self):
+        import numpy as np
+        stats = {}
+        for key, samples in self.samples.items():
+            values = np.frombuffer(samples, dtype=np.float64)
+            entry = {
+                'calls': len(values),
+                'total': float(values.sum()),
+                'mean': float(values.mean()),
+                'max': float(values.max()),
+            }
+            for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                entry['p{0}'.format(percentile)] = float(value)
+            stats[key] = entry
+        return stats
+
+    # Returns a printable table of stats() by total time, followed by the
+    # users that took longest
+    def report(self, top_users=10):
+        stats = self.stats()
+        header = '{0:<36}{1:>10}{2:>12}{3:>12}'.format('feature', 'calls', 'total (s)', 'mean (ms)')
+        for percentile in PERCENTILES:
+            header += '{0:>11}'.format('p{0} (ms)'.format(percentile))
+        lines = [header]
+        for key, entry in sorted(stats.items(), key=lambda item: -item[1]['total']):
+            line = '{0:<36}{1:>10}{2:>12.4f}{3:>12.4f}'.format(key, entry['calls'], entry['total'], entry['mean'] * 1000)
+            for percentile in PERCENTILES:
+                line += '{0:>11.4f}'.format(entry['p{0}'.format(percentile)] * 1000)
+            lines.append(line)
+        if self.userTimes:
+            lines.append('slowest users:')
+            for user_id, seconds in sorted(self.userTimes.items(), key=lambda item: -item[1])[:top_users]:
+                lines.append('  {0:<34}{1:>12.4f}'.format(str(user_id), seconds))
+        return '\n'.join(lines)
+
+    # Writes stats() and the per-user times to path as JSON
+    def toJSON(self, path):
+        with open(path, 'w') as f:
+            json.dump({'features': self.stats(),
+                       'users': dict((str(user_id), seconds) for user_id, seconds in self.userTimes.items())},
+                      f, indent=2, sort_keys=True)
+
+    # Writes the timings to path in the marshal format cProfile uses, so
+    # pstats, snakeviz and gprof2dot can read them. Every key is a function
+    # called from one 'features' root.
+    def dumpStats(self, path):
+        root = ('featureProfiler', 0, 'features')
+        stats = {}
+        total_time = 0.0
+        for key, entry in self.stats().items():
+            calls, seconds = entry['calls'], entry['total']
+            stats[('feature', 0, key)] = (calls, calls, seconds, seconds, {root: (calls, calls, seconds, seconds)})
+            total_time += seconds
+        stats[root] = (1, 1, 0.0, total_time, {})
+        with open(path, 'wb') as f:
+            marshal.dump(stats, f)
+
+    # Writes the timings to path as folded stacks ('features;key microseconds'
+    # per line), the input of flamegraph.pl and speedscope
+    def dumpFolded(self, path):
+        with open(path, 'w') as f:
+            for key, entry in sorted(self.stats().items()):
+                f.write('features;{0} {1}\n'.format(key.replace(';', ':'), int(round(entry['total'] * 1e6))))
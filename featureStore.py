@@ -0,0 +1,134 @@
+'''
+featureStore.py
+Persistent per-user feature cache. For every user it remembers the mtime, size
+and content hash of tweets.pickl and user.pickl, and for every feature the
+values and the Feature.VERSION they were computed with. A user's features are
+only recomputed when those inputs or the feature's VERSION change.
+'''
+
+import hashlib
+import json
+import os
+import sqlite3
+
+INPUT_FILES = ('tweets.pickl', 'user.pickl')
+
+# Returns the hex sha1 of a file's contents
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# json fallback for NumPy scalars in feature values
+def _to_builtin(value):
+    return value.item()
+
+class FeatureStore:
+    '''
+    FeatureStore: SQLite-backed cache of feature values keyed by user id
+    Attributes:
+        path: path of the SQLite database file
+        hits: feature values loaded from the store
+        misses: feature values that had to be computed
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(path, timeout=60)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS inputs ('
+                           'user_id TEXT, file TEXT, mtime INTEGER, size INTEGER, hash TEXT, '
+                           'PRIMARY KEY (user_id, file))')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS features ('
+                           'user_id TEXT, feature TEXT, version INTEGER, vals TEXT NOT NULL, '
+                           'PRIMARY KEY (user_id, feature))')
+
+    # Worker processes open their own connection to the same file
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Returns True if tweets.pickl and user.pickl of the user's folder are the
+    # ones the stored features were computed from. Files whose mtime or size
+    # moved but whose content hash is unchanged are re-recorded and still count
+    # as unchanged.
+    def inputsUnchanged(self, user):
+        if not os.path.isdir(str(user.id)):
+            return False
+        stored = dict((row[0], row[1:]) for row in self._conn.execute(
+            'SELECT file, mtime, size, hash FROM inputs WHERE user_id = ?', (str(user.id),)))
+        if not stored:
+            return False
+        for name in INPUT_FILES:
+            path = os.path.join(str(user.id), name)
+            record = stored.get(name)
+            if not os.path.isfile(path):
+                if record is not None and record[2] is not None:
+                    return False
+                continue
+            if record is None or record[2] is None:
+                return False
+            st = os.stat(path)
+            if (st.st_mtime_ns, st.st_size) == (record[0], record[1]):
+                continue
+            if file_hash(path) != record[2]:
+                return False
+            self._conn.execute('UPDATE inputs SET mtime = ?, size = ? WHERE user_id = ? AND file = ?',
+                               (st.st_mtime_ns, st.st_size, str(user.id), name))
+        return True
+
+    # Records the current tweets.pickl/user.pickl of the user's folder. Call
+    # invalidate() first so no features from older inputs survive.
+    def recordInputs(self, user):
+        self._conn.execute('DELETE FROM inputs WHERE user_id = ?', (str(user.id),))
+        for name in INPUT_FILES:
+            path = os.path.join(str(user.id), name)
+            if os.path.isfile(path):
+                st = os.stat(path)
+                self._conn.execute('INSERT INTO inputs VALUES (?, ?, ?, ?, ?)',
+                                   (str(user.id), name, st.st_mtime_ns, st.st_size, file_hash(path)))
+            else:
+                self._conn.execute('INSERT INTO inputs VALUES (?, ?, NULL, NULL, NULL)', (str(user.id), name))
+
+    # Returns the stored list of (key, value) pairs of feature for user_id,
+    # or None if there is none for the feature's current VERSION
+    def load(self, user_id, feature):
+        row = self._conn.execute('SELECT version, vals FROM features WHERE user_id = ? AND feature = ?',
+                                 (str(user_id), feature.__name__)).fetchone()
+        if row is None or row[0] != feature.VERSION:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [tuple(pair) for pair in json.loads(row[1])]
+
+    def save(self, user_id, feature, pairs):
+        self._conn.execute('INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?)',
+                           (str(user_id), feature.__name__, feature.VERSION, json.dumps([list(pair) for pair in pairs], default=_to_builtin)))
+
+    # Drops every stored feature of user_id
+    def invalidate(self, user_id):
+        self._conn.execute('DELETE FROM features WHERE user_id = ?', (str(user_id),))
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self.commit()
+        self._conn.close()
+
+    # Returns a one-line summary of hit and miss counts
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = float(self.hits) / lookups if lookups else 0.0
+        return 'FeatureStore {0}: {1} cached, {2} computed, hit rate {3:.1%}'.format(
+            self.path, self.hits, self.misses, rate)
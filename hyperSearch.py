@@ -0,0 +1,183 @@
+'''
+hyperSearch.py
+Budgeted hyperparameter search for the classifier models. Features are
+extracted once; every trial reuses the same matrix through one
+crossValidation.SharedMatrix. Configurations are ranked by successive
+halving: all of them are scored by stratified k-fold on a small sample of the
+users, the best 1/eta go on to a sample eta times larger, and so on until the
+survivors are scored on every user. The search stops early when its
+wall-clock budget runs out, and the best configuration is trained on all users
+and saved as a modelArtifact.
+
+Usage:
+    python hyperSearch.py data_folder model.pkl [target] [budget_seconds] [workers]
+'''
+
+import itertools
+import math
+import sys
+import time
+
+import numpy as np
+
+import crossValidation
+import featurePipeline
+import modelArtifact
+import problemset3
+
+# Values tried for each parameter of each model in classifier.MODELS
+SEARCH_SPACES = {
+    'svm': {
+        'C': [0.01, 0.1, 1.0, 10.0, 100.0],
+        'class_weight': [None, 'balanced'],
+    },
+    'naivebayes': {
+        'alpha': [0.01, 0.1, 0.5, 1.0, 2.0],
+        'fit_prior': [True, False],
+    },
+}
+
+# Input:
+# models = names of models in SEARCH_SPACES.
+# Returns:
+# List of (model name, params) pairs, one per point of each model's grid.
+def candidates(models):
+    configs = []
+    for name in models:
+        space = SEARCH_SPACES[name]
+        keys = sorted(space)
+        for values in itertools.product(*(space[key] for key in keys)):
+            configs.append((name, dict(zip(keys, values))))
+    return configs
+
+# Input:
+# labels = array with the class of every row.
+# size = number of rows to sample.
+# seed = seed of the sample.
+# Returns:
+# Sorted array of row indices with every class kept in proportion.
+def stratified_sample(labels, size, seed=0):
+    # StratifiedShuffleSplit needs one left-out row per class
+    if size > len(labels) - len(set(labels.tolist())):
+        return np.arange(len(labels))
+    from sklearn.model_selection import StratifiedShuffleSplit
+    splitter = StratifiedShuffleSplit(n_splits=1, train_size=size, random_state=seed)
+    sample, rest = next(splitter.split(np.zeros(len(labels)), labels))
+    return np.sort(sample)
+
+# Input:
+# X = feature matrix, one row per user.
+# labels = class of every row.
+# models = names of models to search, default every model in SEARCH_SPACES.
+# budget = seconds the search may take; None for no limit.
+# k = number of folds each configuration is scored with.
+# eta = factor the configurations are cut by, and the sample grown by, per round.
+# workers = number of worker processes fitting folds.
+# seed = seed of the samples, the folds and the estimators.
+# Returns:
+# List of trials, one per configuration per round it completed. A trial is
+# a dictionary with model, params, round, num_users, accuracy (mean over
+# the folds) and fit_time (summed over the folds).
+def successive_halving(X, labels, models=None, budget=None, k=5, eta=3, workers=1, seed=0):
+    if models is None:
+        models = sorted(SEARCH_SPACES)
+    labels = np.asarray(labels)
+    configs = candidates(models)
+    deadline = time.time() + budget if budget is not None else None
+
+    num_rounds = max(1, int(math.ceil(math.log(len(configs), eta))))
+    # Every fold needs at least one user of each class in its test part
+    min_users = min(len(labels), k * len(set(labels.tolist())) * 2)
+    trials = []
+    with crossValidation.SharedMatrix(X) as shared:
+        for round_number in range(num_rounds):
+            size = len(labels) // eta ** (num_rounds - 1 - round_number)
+            sample = stratified_sample(labels, max(size, min_users), seed)
+            folds = crossValidation.stratified_folds(labels[sample], k, seed)
+            tasks = [(name, fold, sample[train], sample[test], params)
+                     for name, params in configs
+                     for fold, (train, test) in enumerate(folds)]
+
+            rows = []
+            results = shared.runFolds(tasks, labels, workers, seed)
+            try:
+                for row in results:
+                    rows.append(row)
+                    # The first configuration always finishes, so there is a best one
+                    if deadline is not None and time.time() > deadline and len(rows) >= k:
+                        break
+            finally:
+                results.close()
+
+            # Configurations with every fold done are ranked; the rest are dropped
+            round_trials = []
+            for i, (name, params) in enumerate(configs):
+                fold_rows = rows[i * k:(i + 1) * k]
+                if len(fold_rows) < k:
+                    break
+                round_trials.append({
+                    'model': name,
+                    'params': params,
+                    'round': round_number,
+                    'num_users': len(sample),
+                    'accuracy': np.mean([row['accuracy'] for row in fold_rows]),
+                    'fit_time': sum(row['fit_time'] for row in fold_rows),
+                })
+            trials.extend(round_trials)
+            if not round_trials or (deadline is not None and time.time() > deadline):
+                break
+            round_trials.sort(key=lambda trial: -trial['accuracy'])
+            keep = max(1, int(math.ceil(len(round_trials) / float(eta))))
+            configs = [(trial['model'], trial['params']) for trial in round_trials[:keep]]
+    return trials
+
+# Returns the trial with the best accuracy among those of the last round
+# reached, where the configurations were scored on the most users
+def best_trial(trials):
+    if not trials:
+        raise ValueError('the budget ran out before any configuration was scored')
+    last_round = max(trial['round'] for trial in trials)
+    return max((trial for trial in trials if trial['round'] == last_round), key=lambda trial: trial['accuracy'])
+
+def print_trials(trials):
+    print('{0:<6}{1:>7}{2:>10}{3:>10}  {4:<12}{5}'.format('round', 'users', 'accuracy', 'fit (s)', 'model', 'params'))
+    for trial in trials:
+        print('{0:<6}{1:>7}{2:>10.3f}{3:>10.4f}  {4:<12}{5}'.format(
+            trial['round'], trial['num_users'], trial['accuracy'], trial['fit_time'], trial['model'], trial['params']))
+
+# Input:
+# data_folder = data folder or compiled corpus to search on.
+# target = User attribute to learn.
+# budget = seconds the search may take; None for no limit.
+# workers = number of processes for loading, feature extraction and folds.
+# models = names of models to search, default every model in SEARCH_SPACES.
+# Returns:
+# (artifact, trials): the best configuration fitted on every user, with the
+# search trials stored under 'search', and the list of trials.
+def search(data_folder, target='gender', budget=None, workers=1, models=None):
+    pipeline = featurePipeline.FeaturePipeline(problemset3.FEATURES)
+    values = []
+    X = pipeline.transform(modelArtifact.labelled_users(problemset3.iter_users(data_folder, workers=workers),
+                                                        target, values),
+                           workers=workers)
+    trials = successive_halving(X, values, models=models, budget=budget, workers=workers)
+    best = best_trial(trials)
+    artifact = modelArtifact.fit_artifact(pipeline, X, values, target, best['model'], best['params'])
+    artifact['search'] = trials
+    return artifact, trials
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    data_folder, model_path = sys.argv[1], sys.argv[2]
+    target = sys.argv[3] if len(sys.argv) > 3 else 'gender'
+    budget = float(sys.argv[4]) if len(sys.argv) > 4 else None
+    workers = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+    artifact, trials = search(data_folder, target=target, budget=budget, workers=workers)
+    print_trials(trials)
+    modelArtifact.save(artifact, model_path)
+    print('best: {0} {1}, saved to {2}'.format(artifact['model_name'], artifact['params'], model_path))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+'''
+importBudget.py
+Checks how long importing the main modules takes, each in a fresh
+interpreter, and that none of them loads the heavy NLP/ML libraries at
+import time; those are only imported by the features and models that use
+them. Exits with status 1 if a module goes over its budget or loads one.
+
+Usage:
+    python importBudget.py [repeat]
+'''
+
+import os
+import subprocess
+import sys
+
+# Milliseconds each module may take to import, cumulative over everything
+# it imports
+BUDGETS_MS = {
+    'dataStructures': 150,
+    'analysisCache': 100,
+    'featurePipeline': 200,
+    'classifier': 50,
+    'problemset3': 300,
+    'modelArtifact': 300,
+}
+
+# Libraries no module in BUDGETS_MS may import at load time
+HEAVY_MODULES = ['textblob', 'nltk', 'sklearn', 'scipy', 'numpy']
+
+_PROBE = ('import sys, {0}; '
+          'print(",".join(name for name in {1!r} if name in sys.modules))')
+
+# Input:
+# module = name of the module to import.
+# Returns:
+# (milliseconds, heavy): cumulative import time of module as reported by
+# python -X importtime, and the list of HEAVY_MODULES it loaded.
+def measure(module):
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROBE.format(module, HEAVY_MODULES)],
+                            cwd=here, capture_output=True, text=True, check=True)
+    milliseconds = None
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            milliseconds = int(parts[1]) / 1000.0
+    heavy = [name for name in result.stdout.strip().split(',') if name]
+    return milliseconds, heavy
+
+# Returns the list of (module, best milliseconds, budget, heavy modules) rows
+def check(repeat=3):
+    rows = []
+    for module, budget in sorted(BUDGETS_MS.items()):
+        runs = [measure(module) for i in range(repeat)]
+        rows.append((module, min(run[0] for run in runs), budget, runs[-1][1]))
+    return rows
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    failed = False
+    print('{0:<18}{1:>10}{2:>10}  {3:<14}{4}'.format('module', 'ms', 'budget', 'status', 'heavy imports'))
+    for module, milliseconds, budget, heavy in check(repeat):
+        status = 'ok'
+        if milliseconds > budget or heavy:
+            status = 'OVER BUDGET' if milliseconds > budget else 'HEAVY IMPORT'
+            failed = True
+        print('{0:<18}{1:>10.1f}{2:>10}  {3:<14}{4}'.format(module, milliseconds, budget, status, ','.join(heavy) or '-'))
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+'''
+incrementalTraining.py
+Out-of-core training: users are streamed from the loader in batches, each
+batch is turned into a fixed-width hashed feature matrix
+(featurePipeline.hash_rows) and fed to a model's partial_fit, so no more than
+one batch of users and features is in memory at a time. Every few batches the
+model is saved as a modelArtifact checkpoint; a run started again with the
+same checkpoint path resumes after the users it already learned from.
+
+Usage:
+    python incrementalTraining.py data_folder model.pkl classes [target] [model] [batch_size] [workers]
+    classes = comma separated target values, e.g. Male,Female
+'''
+
+import os
+import sys
+import time
+
+import numpy as np
+
+import classifier
+import featurePipeline
+import modelArtifact
+import problemset3
+
+# Width of the hashed feature vectors
+HASH_WIDTH = 2 ** 12
+
+# Input:
+# users = iterable of User objects.
+# target = User attribute to learn.
+# classes = target values to learn; users with any other value are skipped.
+# labels = list that the target of every yielded user is appended to.
+# skip = number of matching users to pass over first (already trained on).
+# Returns:
+# Generator of the users whose target is one of classes.
+def class_users(users, target, classes, labels, skip=0):
+    classes = set(classes)
+    for user in users:
+        value = getattr(user, target, None)
+        if value in classes:
+            if skip:
+                skip -= 1
+                continue
+            labels.append(value)
+            yield user
+
+# Returns the names of the training settings in which artifact differs from
+# the given ones. Settings are looked up in the artifact, then in its
+# checkpoint entry (data_folder and batch_size).
+def _changed_settings(artifact, settings):
+    checkpoint = artifact['checkpoint']
+    return [name for name, value in sorted(settings.items())
+            if artifact.get(name, checkpoint.get(name)) != value]
+
+# Input:
+# data_folder = data folder or compiled corpus to train on.
+# classes = list of every target value the model can predict.
+# target = User attribute to learn.
+# model = name of a model in classifier.INCREMENTAL_MODELS.
+# batch_size = number of users per partial_fit call.
+# checkpoint = optional path the artifact is saved to every checkpoint_every
+#              batches and at the end. If it already holds a run with the same
+#              data folder and settings, training resumes from it (a finished
+#              run is returned as it is); a run with other settings raises
+#              ValueError.
+# checkpoint_every = number of batches between checkpoints.
+# workers = number of processes for loading and feature extraction.
+# width = number of hashed feature columns.
+# Returns:
+# Artifact dictionary as from modelArtifact.fit_artifact, plus hash_width
+# and a checkpoint entry with users_done, batches_done, finished, and the
+# data_folder and batch_size of the run.
+def train(data_folder, classes, target='gender', model='sgd', batch_size=1000, checkpoint=None,
+          checkpoint_every=10, workers=1, width=HASH_WIDTH):
+    if model not in classifier.INCREMENTAL_MODELS:
+        raise ValueError('{0} has no partial_fit; use one of {1}'.format(model, sorted(classifier.INCREMENTAL_MODELS)))
+    labels = sorted(classes)
+    label_index = dict((label, i) for i, label in enumerate(labels))
+    pipeline = featurePipeline.FeaturePipeline(problemset3.FEATURES)
+    settings = {
+        'data_folder': os.path.abspath(data_folder),
+        'target': target,
+        'model_name': model,
+        'labels': labels,
+        'features': [feature.__name__ for feature in pipeline.features],
+        'hash_width': width,
+        'batch_size': batch_size,
+    }
+
+    if checkpoint is not None and os.path.exists(checkpoint):
+        artifact = modelArtifact.load(checkpoint)
+        changed = _changed_settings(artifact, settings)
+        if changed:
+            raise ValueError('checkpoint {0} is from a different training setup ({1} differ)'.format(
+                checkpoint, ', '.join(changed)))
+        if artifact['checkpoint']['finished']:
+            print('checkpoint {0} is already finished; returning it without training'.format(checkpoint),
+                  file=sys.stderr)
+            return artifact
+    else:
+        artifact = {
+            'version': modelArtifact.ARTIFACT_VERSION,
+            'created': time.time(),
+            'target': target,
+            'model_name': model,
+            'params': {},
+            'features': settings['features'],
+            'columns': [],
+            'labels': labels,
+            'model': classifier.MODELS[model](),
+            'num_training_users': 0,
+            'hash_width': width,
+            'checkpoint': {'users_done': 0, 'batches_done': 0, 'finished': False,
+                           'data_folder': settings['data_folder'], 'batch_size': batch_size},
+        }
+    progress = artifact['checkpoint']
+    estimator = artifact['model']
+
+    values = []
+    users = class_users(problemset3.iter_users(data_folder, workers=workers), target, labels, values,
+                        skip=progress['users_done'])
+    rows = pipeline.parallelRows(users, workers)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) < batch_size:
+            continue
+        _fit_batch(estimator, batch, values, label_index, width)
+        progress['users_done'] += len(batch)
+        progress['batches_done'] += 1
+        batch = []
+        if checkpoint is not None and progress['batches_done'] % checkpoint_every == 0:
+            artifact['num_training_users'] = progress['users_done']
+            modelArtifact.save(artifact, checkpoint)
+    if batch:
+        _fit_batch(estimator, batch, values, label_index, width)
+        progress['users_done'] += len(batch)
+        progress['batches_done'] += 1
+
+    artifact['num_training_users'] = progress['users_done']
+    progress['finished'] = True
+    if checkpoint is not None:
+        modelArtifact.save(artifact, checkpoint)
+    return artifact
+
+# Updates estimator with one batch of rows. The batch's labels are the first
+# len(rows) entries of values, which are removed.
+def _fit_batch(estimator, rows, values, label_index, width):
+    X = featurePipeline.hash_rows(rows, width)
+    y = np.asarray([label_index[value] for value in values[:len(rows)]])
+    del values[:len(rows)]
+    estimator.partial_fit(X, y, classes=np.arange(len(label_index)))
+
+def main():
+    if len(sys.argv) < 4:
+        print(__doc__)
+        sys.exit(1)
+    data_folder, model_path = sys.argv[1], sys.argv[2]
+    classes = sys.argv[3].split(',')
+    target = sys.argv[4] if len(sys.argv) > 4 else 'gender'
+    model = sys.argv[5] if len(sys.argv) > 5 else 'sgd'
+    batch_size = int(sys.argv[6]) if len(sys.argv) > 6 else 1000
+    workers = int(sys.argv[7]) if len(sys.argv) > 7 else 1
+    artifact = train(data_folder, classes, target=target, model=model, batch_size=batch_size,
+                     checkpoint=model_path, workers=workers)
+    print('trained {0} on {1} users in {2} batches for {3}'.format(
+        model, artifact['num_training_users'], artifact['checkpoint']['batches_done'], target))
+
+if __name__ == '__main__':
+    main()
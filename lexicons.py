@@ -0,0 +1,103 @@
+'''
+lexicons.py
+Process-wide registry of the word lists used by the features. Each lexicon is
+loaded once into a frozenset, so lookups are O(1) and no feature reads a file
+per tweet.
+'''
+
+import os
+
+EMOTIONAL_WORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'EmotionalWords.txt')
+
+PERSONAL_REFERENCES = ['I', 'he', 'she', 'we', 'you', 'they']
+
+CATEGORICAL_WORDS = ['help', 'acheive', 'success', 'dreams', 'goals',
+                     'career', 'beer', 'alcohol', 'sex', 'football',
+                     'esteem', 'ego', 'pride', 'gym']
+
+class LexiconRegistry:
+    '''
+    LexiconRegistry: named word lists, each loaded at most once per process
+    Attributes: None
+    A lexicon backed by a file is reloaded by reloadIfChanged() when the
+    file's modification time changes.
+    '''
+    def __init__(self):
+        self._loaders = {}
+        self._paths = {}
+        self._lexicons = {}
+        self._mtimes = {}
+
+    # name: lexicon name
+    # loader: function returning an iterable of words (called with path, if given)
+    # path: optional file the lexicon is read from
+    def register(self, name, loader, path=None):
+        self._loaders[name] = loader
+        self._paths[name] = path
+        self._lexicons.pop(name, None)
+
+    # Returns the lexicon as a frozenset, loading it on first use
+    def get(self, name):
+        lexicon = self._lexicons.get(name)
+        if lexicon is None:
+            lexicon = self._load(name)
+        return lexicon
+
+    def _load(self, name):
+        path = self._paths[name]
+        if path is None:
+            lexicon = frozenset(self._loaders[name]())
+        else:
+            self._mtimes[name] = os.path.getmtime(path)
+            lexicon = frozenset(self._loaders[name](path))
+        self._lexicons[name] = lexicon
+        return lexicon
+
+    # Reloads every loaded file-backed lexicon whose file changed.
+    # Returns the list of names that were reloaded.
+    def reloadIfChanged(self):
+        reloaded = []
+        for name in list(self._lexicons):
+            path = self._paths[name]
+            if path is not None and os.path.getmtime(path) != self._mtimes.get(name):
+                self._load(name)
+                reloaded.append(name)
+        return reloaded
+
+    # names: lexicons to load first, e.g. those the workers' features read
+    # Returns a picklable dict of the loaded lexicons, for handing to workers
+    def snapshot(self, names=()):
+        for name in names:
+            self.get(name)
+        return dict(self._lexicons)
+
+    # Installs lexicons from snapshot() so a worker never loads them itself
+    def install(self, lexicons):
+        self._lexicons.update(lexicons)
+
+def _read_emotional_words(path):
+    with open(path, 'r') as f:
+        return [word.strip().lower() for word in f.read().split(',') if word.strip()]
+
+def _english_stopwords():
+    from nltk.corpus import stopwords
+    return stopwords.words('english')
+
+def _wordnet_lemma_names():
+    from nltk.corpus import wordnet
+    return wordnet.all_lemma_names()
+
+REGISTRY = LexiconRegistry()
+REGISTRY.register('emotional', _read_emotional_words, EMOTIONAL_WORDS_FILE)
+REGISTRY.register('stopwords', _english_stopwords)
+REGISTRY.register('wordnet_lemmas', _wordnet_lemma_names)
+REGISTRY.register('personal_references', lambda: PERSONAL_REFERENCES)
+REGISTRY.register('categorical', lambda: CATEGORICAL_WORDS)
+
+# Returns the named lexicon from the process-wide registry
+def get(name):
+    return REGISTRY.get(name)
+
+# Pool initializer: installs a snapshot of the parent's lexicons in a worker
+def install(lexicons):
+    REGISTRY.install(lexicons)
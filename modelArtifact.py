@@ -0,0 +1,179 @@
+'''
+modelArtifact.py
+Train once, predict many: saves a fitted model together with everything needed
+to score new users (feature list, frozen column index, label mapping), and
+loads it back for batch inference without retraining.
+
+Usage:
+    python modelArtifact.py train data_folder model.pkl [target] [model] [workers]
+    python modelArtifact.py score model.pkl data_folder [output.txt] [workers]
+'''
+
+import os
+import pickle
+import sys
+import time
+
+import classifier
+import dataStructures
+import featurePipeline
+import problemset3
+
+ARTIFACT_VERSION = 1
+
+# Input:
+# users = iterable of User objects.
+# target = User attribute to learn, e.g. 'gender', 'education' or 'year'.
+# labels = list that the target of every yielded user is appended to.
+# Returns:
+# Generator of the users that have a value for target.
+def labelled_users(users, target, labels):
+    for user in users:
+        value = getattr(user, target, None)
+        if value not in (None, '', 0):
+            labels.append(value)
+            yield user
+
+# Input:
+# pipeline = fitted FeaturePipeline that produced X; it is frozen here.
+# X = feature matrix of the training users.
+# values = target value of every row of X.
+# target = User attribute that was learned.
+# model = name of a model in classifier.MODELS.
+# params = optional dictionary passed to the estimator's set_params.
+# Returns:
+# Artifact dictionary, ready for save().
+def fit_artifact(pipeline, X, values, target, model='svm', params=None):
+    import numpy as np
+    pipeline.freeze()
+    if model in classifier.ROUNDED_MODELS:
+        # Regression models predict the target value itself
+        labels = None
+        y = np.asarray(values, dtype=np.float64)
+    else:
+        labels = sorted(set(values))
+        label_index = dict((label, i) for i, label in enumerate(labels))
+        y = np.asarray([label_index[value] for value in values])
+
+    estimator = classifier.MODELS[model]()
+    if params:
+        estimator.set_params(**params)
+    estimator.fit(X, y)
+    return {
+        'version': ARTIFACT_VERSION,
+        'created': time.time(),
+        'target': target,
+        'model_name': model,
+        'params': dict(params or {}),
+        'features': [feature.__name__ for feature in pipeline.features],
+        'columns': pipeline.columns,
+        'labels': labels,
+        'model': estimator,
+        'num_training_users': X.shape[0],
+    }
+
+# Input:
+# data_folder = data folder or compiled corpus to train on.
+# target = User attribute to learn.
+# model = name of a model in classifier.MODELS.
+# features = list of Feature classes, default problemset3.FEATURES.
+# workers = number of processes for loading and feature extraction.
+# params = optional dictionary passed to the estimator's set_params.
+# Returns:
+# Artifact dictionary, ready for save().
+def train(data_folder, target='gender', model='svm', features=None, workers=1, params=None):
+    if features is None:
+        features = problemset3.FEATURES
+    pipeline = featurePipeline.FeaturePipeline(features)
+    values = []
+    X = pipeline.transform(labelled_users(problemset3.iter_users(data_folder, workers=workers), target, values),
+                           workers=workers)
+    return fit_artifact(pipeline, X, values, target, model, params)
+
+# Writes artifact to path; a crash never leaves a half-written file behind
+def save(artifact, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+# Returns the artifact stored at path
+def load(path):
+    with open(path, 'rb') as f:
+        artifact = pickle.load(f)
+    if artifact.get('version') != ARTIFACT_VERSION:
+        raise ValueError('model artifact {0} has version {1}, expected {2}'.format(
+            path, artifact.get('version'), ARTIFACT_VERSION))
+    return artifact
+
+# Returns a frozen FeaturePipeline producing the artifact's columns
+def artifact_pipeline(artifact):
+    features = [dataStructures.Feature.registry[name] for name in artifact['features']]
+    return featurePipeline.FeaturePipeline(features, columns=artifact['columns'])
+
+# Input:
+# artifact = loaded artifact.
+# users = list or iterator of User objects.
+# workers = number of processes for feature extraction.
+# Returns:
+# (user_ids, predictions): lists in input order. Predictions are labels
+# for classifiers and rounded target values for regression models.
+def predict(artifact, users, workers=1):
+    import numpy as np
+    user_ids = []
+
+    def remember(users):
+        for user in users:
+            user_ids.append(user.id)
+            yield user
+
+    pipeline = artifact_pipeline(artifact)
+    if artifact.get('hash_width'):
+        # Trained on hashed features (see incrementalTraining)
+        X = featurePipeline.hash_rows(pipeline.parallelRows(remember(users), workers), artifact['hash_width'])
+    else:
+        X = pipeline.transform(remember(users), workers=workers)
+    if X.shape[0] == 0:
+        return user_ids, []
+    Y_pred = artifact['model'].predict(X)
+    if artifact['labels'] is None:
+        return user_ids, np.rint(Y_pred).astype(np.int64).tolist()
+    labels = np.asarray(artifact['labels'], dtype=object)
+    return user_ids, labels[np.asarray(Y_pred, dtype=np.int64)].tolist()
+
+# Input:
+# model_path = saved artifact.
+# data_folder = data folder or compiled corpus to score.
+# workers = number of processes for loading and feature extraction.
+# Returns:
+# (user_ids, predictions) as from predict().
+def score_folder(model_path, data_folder, workers=1):
+    artifact = load(model_path)
+    return predict(artifact, problemset3.iter_users(data_folder, workers=workers), workers=workers)
+
+def main():
+    if len(sys.argv) < 4 or sys.argv[1] not in ('train', 'score'):
+        print(__doc__)
+        sys.exit(1)
+    if sys.argv[1] == 'train':
+        data_folder, model_path = sys.argv[2], sys.argv[3]
+        target = sys.argv[4] if len(sys.argv) > 4 else 'gender'
+        model = sys.argv[5] if len(sys.argv) > 5 else 'svm'
+        workers = int(sys.argv[6]) if len(sys.argv) > 6 else 1
+        artifact = train(data_folder, target=target, model=model, workers=workers)
+        save(artifact, model_path)
+        print('trained {0} on {1} users for {2}'.format(model, artifact['num_training_users'], target))
+    else:
+        model_path, data_folder = sys.argv[2], sys.argv[3]
+        out_file = sys.argv[4] if len(sys.argv) > 4 else None
+        workers = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+        user_ids, predictions = score_folder(model_path, data_folder, workers=workers)
+        lines = ''.join('{0}\t{1}\n'.format(user_id, prediction) for user_id, prediction in zip(user_ids, predictions))
+        if out_file is None:
+            sys.stdout.write(lines)
+        else:
+            with open(out_file, 'w') as f:
+                f.write(lines)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+'''
+ngramHashing.py
+Text features from User.ngrams (and optionally User.replacements and
+User.transforms). Each entry is hashed into a fixed number of columns with
+signed feature hashing, so memory depends only on the width and the number of
+non-zeros, never on the vocabulary. Rows can be TF-IDF weighted, and
+combined_matrix puts them next to the hand-crafted FeaturePipeline columns.
+
+Signed hashing gives negative values, which suits the linear models ('svm',
+'sgd'); use signed=False for 'naivebayes'.
+'''
+
+import numbers
+
+import scipy.sparse
+
+# Key prefixes, so an entry in two sources hashes to different columns
+SOURCES = {
+    'ngrams': 'ngram=',
+    'replacements': 'replacement=',
+    'transforms': 'transform=',
+}
+
+# Returns the (key, count) pairs of one user's ngrams/replacements/transforms
+def user_pairs(user, sources=('ngrams',)):
+    pairs = []
+    for source in sources:
+        prefix = SOURCES[source]
+        for entry, count in (getattr(user, source) or {}).items():
+            if isinstance(entry, tuple):
+                entry = ' '.join(str(word) for word in entry)
+            pairs.append((prefix + str(entry), count if isinstance(count, numbers.Number) else 1))
+    return pairs
+
+class NgramHasher:
+    '''
+    NgramHasher: hashes users' ngram dictionaries into a fixed-width matrix
+    Attributes:
+        width: number of columns
+        sources: User attributes hashed, from SOURCES
+        signed: if True each entry's sign comes from a second hash, so
+                collisions tend to cancel instead of adding up
+        tfidf: if True rows are TF-IDF weighted and L2 normalized; the
+               document frequencies are learned by the first transform
+               with fit=True and reused afterwards
+        batchSize: number of users hashed together
+    '''
+    def __init__(self, width=2 ** 18, sources=('ngrams',), signed=True, tfidf=False, batchSize=256):
+        for source in sources:
+            if source not in SOURCES:
+                raise ValueError('unknown ngram source {0}'.format(source))
+        self.width = width
+        self.sources = tuple(sources)
+        self.signed = signed
+        self.tfidf = tfidf
+        self.batchSize = batchSize
+        self._weights = None
+
+    # Returns the raw hashed matrix of a list of pair lists
+    def _hash(self, pair_lists):
+        from sklearn.feature_extraction import FeatureHasher
+        hasher = FeatureHasher(n_features=self.width, input_type='pair', alternate_sign=self.signed)
+        return hasher.transform(pair_lists).tocsr()
+
+    # Input:
+    # users = iterable of User objects.
+    # blocks = list that one hashed matrix per batch of users is appended to.
+    # Returns:
+    # Generator passing users through unchanged, so the ngrams are hashed in
+    # the same pass that feeds another consumer (see combined_matrix).
+    def tee(self, users, blocks):
+        batch = []
+        for user in users:
+            batch.append(user_pairs(user, self.sources))
+            # The dictionaries are read again from disk if anything needs them
+            user.evict()
+            yield user
+            if len(batch) >= self.batchSize:
+                blocks.append(self._hash(batch))
+                batch = []
+        if batch:
+            blocks.append(self._hash(batch))
+
+    # Input:
+    # blocks = hashed matrices from tee().
+    # fit = learn the TF-IDF document frequencies from these rows.
+    # Returns:
+    # scipy.sparse.csr_matrix of the stacked, weighted rows.
+    def finish(self, blocks, fit=False):
+        if blocks:
+            X = scipy.sparse.vstack(blocks).tocsr()
+        else:
+            X = scipy.sparse.csr_matrix((0, self.width))
+        if not self.tfidf:
+            return X
+        if fit:
+            from sklearn.feature_extraction.text import TfidfTransformer
+            self._weights = TfidfTransformer().fit(X)
+        elif self._weights is None:
+            raise ValueError('NgramHasher with tfidf must be fitted first')
+        return self._weights.transform(X).tocsr()
+
+    # Input:
+    # users = iterable of User objects.
+    # fit = learn the TF-IDF document frequencies from these users.
+    # Returns:
+    # scipy.sparse.csr_matrix with one row per user, in input order.
+    def transform(self, users, fit=False):
+        blocks = []
+        for user in self.tee(users, blocks):
+            pass
+        return self.finish(blocks, fit)
+
+# Input:
+# pipeline = FeaturePipeline for the hand-crafted columns.
+# hasher = NgramHasher for the text columns.
+# users = list or iterator of User objects, read once.
+# workers = number of processes computing the pipeline features.
+# fit = learn the hasher's TF-IDF document frequencies from these users.
+# Returns:
+# scipy.sparse.csr_matrix: the pipeline.columns first, then hasher.width
+# hashed columns.
+def combined_matrix(pipeline, hasher, users, workers=1, fit=False):
+    blocks = []
+    num_rows = len(users) if hasattr(users, '__len__') else None
+    features = pipeline.rowsToMatrix(pipeline.parallelRows(hasher.tee(users, blocks), workers), num_rows)
+    return scipy.sparse.hstack([features, hasher.finish(blocks, fit)], format='csr')
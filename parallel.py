@@ -0,0 +1,51 @@
+'''
+parallel.py
+Helpers for spreading work over a pool of processes or threads while keeping
+results in input order.
+'''
+
+import collections
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Input:
+# func = picklable function applied to every item (module level for processes).
+# items = list of items to apply func to.
+# workers = number of workers. 1 or less runs everything in this process.
+# use_threads = use a thread pool instead of a process pool.
+# chunksize = number of items sent to a worker process at a time.
+# initializer = optional function each worker runs once on start, with initargs.
+# Returns:
+# List of func(item) results, in the same order as items.
+def ordered_map(func, items, workers=1, use_threads=False, chunksize=1, initializer=None, initargs=()):
+    if workers is None or workers <= 1:
+        return [func(item) for item in items]
+    executor_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with executor_class(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        return list(executor.map(func, items, chunksize=chunksize))
+
+# Input:
+# func = picklable function applied to every item (module level for processes).
+# items = any iterable of items, consumed lazily.
+# workers = number of workers. 1 or less runs everything in this process.
+# use_threads = use a thread pool instead of a process pool.
+# window = most items in flight at once, which bounds memory use. Defaults to
+#          four per worker.
+# initializer = optional function each worker runs once on start, with initargs.
+# Returns:
+# Generator of func(item) results, in the same order as items.
+def ordered_imap(func, items, workers=1, use_threads=False, window=None, initializer=None, initargs=()):
+    if workers is None or workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+    if window is None:
+        window = workers * 4
+    executor_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with executor_class(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        pending = collections.deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -1,11 +1,15 @@
+import analysisCache
 import dataStructures
-import classifier
+import corpusCache
+import featurePipeline
+import featureStore
+import parallel
+import tagStore
 
+import functools
 import pickle
 import sys, os
 
-from textblob import TextBlob
-
 # Input:
 # files = list of strings of filenames in a directory
 # filename = string of file we are looking for.
@@ -31,91 +35,212 @@ def unpickle_from_filename(root, filename):
         return unpickled_data
 
 # Input:
-# data_folder = string, foldername we are going to recursively traverse.
+# root = root directory that file is in.
+# filename = file we are going to open
 # Returns:
-# List of User objects. There should be a User object per subfolder.
-def load_data(data_folder):
-    user_list = []
-    for root, sub_folders, files in os.walk(data_folder):
-        ngramsFile = check_for_file(files, 'ngrams.pickl')
-        replacementsFile = check_for_file(files, 'replacements.pickl')
-        transformsFile = check_for_file(files, 'transforms.pickl')
-        tweetsFile = check_for_file(files, 'tweets.pickl')
-        userFile = check_for_file(files, 'user.pickl')
+# None if filename is none, otherwise, a LazyPickle that unpickles the file
+# the first time it is accessed.
+def lazy_unpickle_from_filename(root, filename):
+    if filename is None:
+        return None
+    else:
+        return dataStructures.LazyPickle(os.path.join(root, filename))
 
+# Input:
+# user_dir = tuple of (root, files) as produced by os.walk for one folder.
+# lazy = if True, ngrams, replacements and transforms are only unpickled when
+#        first accessed on the User.
+# Returns:
+# User object built from the pickles found in that folder.
+def load_user(user_dir, lazy=True):
+    root, files = user_dir
+    ngramsFile = check_for_file(files, 'ngrams.pickl')
+    replacementsFile = check_for_file(files, 'replacements.pickl')
+    transformsFile = check_for_file(files, 'transforms.pickl')
+    tweetsFile = check_for_file(files, 'tweets.pickl')
+    userFile = check_for_file(files, 'user.pickl')
+
+    if lazy:
+        ngrams = lazy_unpickle_from_filename(root, ngramsFile)
+        replacements = lazy_unpickle_from_filename(root, replacementsFile)
+        transforms = lazy_unpickle_from_filename(root, transformsFile)
+    else:
         ngrams = unpickle_from_filename(root, ngramsFile)
         replacements = unpickle_from_filename(root, replacementsFile)
         transforms = unpickle_from_filename(root, transformsFile)
-        tweets = unpickle_from_filename(root, tweetsFile)
-        userInfo = unpickle_from_filename(root, userFile)
-
-        # Take tweets dictionary and turn to Tweet objects.
-        tweets_list = []
-        if tweets is not None:
-            for tweetId, value in tweets.items():
-                tweet = dataStructures.Tweet(id=tweetId, tokens=value["tokenized"], timestamp=value["time"], rawText=value["text"], numTokens=value["tokens"], numPunctuation=value["punc"])
-                tweets_list.append(tweet)
-
-        user = dataStructures.User(id=root, tweets=tweets_list, ngrams=ngrams, replacements=replacements, transforms=transforms)
-        if userInfo is not None:
-            for key, value in userInfo.items():
-                setattr(user, key.lower(), value)
-        user_list.append(user)
-    return user_list
+    tweets = unpickle_from_filename(root, tweetsFile)
+    userInfo = unpickle_from_filename(root, userFile)
+
+    # Take tweets dictionary and turn to Tweet objects. Tokens are interned and
+    # kept as tuples so repeated words share one string across the corpus.
+    tweets_list = []
+    if tweets is not None:
+        for tweetId, value in tweets.items():
+            tokens = tuple(map(sys.intern, value["tokenized"]))
+            tweet = dataStructures.Tweet(id=tweetId, tokens=tokens, timestamp=value["time"], rawText=value["text"], numTokens=value["tokens"], numPunctuation=value["punc"])
+            tweets_list.append(tweet)
+
+    user = dataStructures.User(id=root, tweets=tweets_list, ngrams=ngrams, replacements=replacements, transforms=transforms, userInfo=userInfo)
+    if userInfo is not None:
+        for key, value in userInfo.items():
+            setattr(user, key.lower(), value)
+    return user
+
+# Input:
+# data_folder = string, foldername we are going to recursively traverse.
+# Returns:
+# Generator of (root, files) tuples, one per user folder, in os.walk order.
+# Folders holding neither tweets.pickl nor user.pickl, such as data_folder
+# itself, are not users and are skipped.
+def iter_user_dirs(data_folder):
+    for root, sub_folders, files in os.walk(data_folder):
+        if 'tweets.pickl' in files or 'user.pickl' in files:
+            yield (root, files)
+
+# Input:
+# data_folder = string, foldername we are going to recursively traverse, or a
+#               corpus cache written by corpusCache.compile_corpus.
+# workers = number of processes (or threads) loading user folders in parallel.
+# use_threads = load with a thread pool instead of a process pool.
+# batch_size = if set, yield lists of up to batch_size Users instead of Users.
+# lazy = defer unpickling ngrams, replacements and transforms until first use.
+# Returns:
+# Generator of User objects (or batches of them) in os.walk order. Folders are
+# read as the walk reaches them, so only a few Users are in memory at a time.
+def iter_users(data_folder, workers=1, use_threads=False, batch_size=None, lazy=True):
+    if corpusCache.is_compiled(data_folder):
+        users = iter(corpusCache.CompiledCorpus(data_folder))
+    else:
+        users = parallel.ordered_imap(functools.partial(load_user, lazy=lazy), iter_user_dirs(data_folder),
+                                      workers=workers, use_threads=use_threads)
+    if not batch_size:
+        for user in users:
+            yield user
+        return
+    batch = []
+    for user in users:
+        batch.append(user)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# Input:
+# data_folder = string, foldername we are going to recursively traverse, or a
+#               corpus cache written by corpusCache.compile_corpus.
+# workers = number of processes (or threads) loading user folders in parallel.
+# use_threads = load with a thread pool instead of a process pool.
+# lazy = defer unpickling ngrams, replacements and transforms until first use.
+# Returns:
+# List of User objects. There should be a User object per user folder, in
+# os.walk order regardless of the number of workers.
+def load_data(data_folder, workers=1, use_threads=False, lazy=True):
+    if corpusCache.is_compiled(data_folder):
+        return list(corpusCache.CompiledCorpus(data_folder))
+    user_dirs = list(iter_user_dirs(data_folder))
+    return parallel.ordered_map(functools.partial(load_user, lazy=lazy), user_dirs, workers=workers, use_threads=use_threads, chunksize=16)
+
+# Shared tokens/POS tags for tweets, so features never redo TextBlob work.
+ANALYSIS_CACHE = analysisCache.AnalysisCache()
+
+# Features computed for every user, in column order.
+FEATURES = [
+    dataStructures.AverageTweetLengthFeature,
+    dataStructures.NumberOfTimesOthersMentionedFeature,
+    dataStructures.CountCategoricalWords,
+    dataStructures.CountPersonalReferences,
+    dataStructures.FrequencyOfTweetingFeature,
+]
+
+# Number of cross-validation folds main() scores every model with.
+CV_FOLDS = 5
+
+# Input:
+# analyses = AnalysisCache the per-tweet TextBlob work is shared through.
+# Returns:
+# FeaturePipeline over FEATURES.
+def make_pipeline(analyses=ANALYSIS_CACHE):
+    return featurePipeline.FeaturePipeline(FEATURES, analyses=analyses)
+
+# Input:
+# user = User object to compute features for.
+# analyses = AnalysisCache the per-tweet TextBlob work is shared through.
+# Returns:
+# Dictionary of feature name to feature value for that user.
+def extract_user_features(user, analyses=ANALYSIS_CACHE):
+    return make_pipeline(analyses).userDict(user)
+
+# Input:
+# users = iterable of User objects.
+# labels = list that the gender of every yielded user is appended to.
+# Returns:
+# Generator of the users whose gender is Male or Female.
+def gendered_users(users, labels):
+    for user in users:
+        if user.gender == "Male" or user.gender == "Female":
+            labels.append(user.gender)
+            yield user
 
 def main():
-    data_folder = sys.argv[1]
-    user_list = load_data(data_folder)
-    user_gender_list = []
+    # --profile anywhere on the command line prints per-feature timings at the
+    # end; --profile=PREFIX also writes PREFIX.json, PREFIX.prof (pstats) and
+    # PREFIX.folded (flame graph)
+    profile = [arg for arg in sys.argv if arg.startswith('--profile')]
+    args = [arg for arg in sys.argv if not arg.startswith('--profile')]
+    if len(args) < 2:
+        print('usage: python problemset3.py data_folder [workers] [tag_store] [feature_store] [--profile[=PREFIX]]')
+        sys.exit(1)
+    # NumPy, SciPy and scikit-learn are only needed once there is work to do
+    import crossValidation
+    data_folder = args[1]
+    workers = int(args[2]) if len(args) > 2 else 1
+    # Optional third argument: SQLite file that POS tags are kept in between runs
+    tag_store = None
+    if len(args) > 3:
+        tag_store = tagStore.TagStore(args[3])
+        ANALYSIS_CACHE.tagStore = tag_store
+    # Optional fourth argument: SQLite file that per-user features are kept in,
+    # so unchanged users are not recomputed
+    feature_store = None
+    if len(args) > 4:
+        feature_store = featureStore.FeatureStore(args[4])
+
+    # Stream users from disk straight into the feature matrix.
     gender_list = []
-    for user in user_list:
-        if user.gender == "Male" or user.gender == "Female":
-            user_gender_list.append(user)
-            gender_list.append(user.gender)
-    training_gender_list = gender_list[:30]
-    test_gender_list = gender_list[30:]
-
-    # Add features to array
-    f_objects = []
-    for user in user_gender_list:
-        avg_tweet_len = dataStructures.AverageTweetLengthFeature(user)
-        num_user_mention = dataStructures.NumberOfTimesOthersMentionedFeature(user)
-        user_dict = {}
-        user_dict[avg_tweet_len.getKey()] = avg_tweet_len.getValue()
-        user_dict[num_user_mention.getKey()] = num_user_mention.getValue()
-        #cap_list = []
-        count = 0
-        count_personal_sum = 0
-        for tweet in user.tweets:
-            count_categorical_words = dataStructures.CountCategoricalWords(tweet)
-            count += count_categorical_words.getValue()
-            tweetTB = TextBlob(tweet.rawText)
-            count_personal = dataStructures.CountPersonalReferences(tweetTB)
-            count_personal_sum += count_personal.getValue()
-            #array.
-            #pos_tag = dataStructures.POSTagging(tweetTB)
-            #user_dict[pos_tag.getKey()] = pos_tag.getValue()
-            #cap_list.append(dataStructures.CapitalizationFeature(tweet))
-
-
-        user_dict[count_categorical_words.getKey()] = count
-        user_dict[count_personal.getKey()] = count_personal_sum
-
-        # Merge in time vectors from that feature
-        time_vector_feature = dataStructures.FrequencyOfTweetingFeature(user)
-        user_dict.update(time_vector_feature.getValue())
-
-        # Add the user dictionary to the features list.
-        f_objects.append(user_dict)
-
-    print(len(f_objects))
-    print(f_objects)
-    training_feature_objects = f_objects[:30]
-    test_feature_objects = f_objects[30:]
-    acc = classifier.get_SVM_Acc(training_feature_objects, training_gender_list, test_feature_objects, test_gender_list)
-    acc_nb = classifier.get_Naivebayes_Acc(training_feature_objects, training_gender_list, test_feature_objects, test_gender_list)
-    print (acc)
-    print(acc_nb)
+    pipeline = make_pipeline()
+    pipeline.store = feature_store
+    users = iter_users(data_folder, workers=workers)
+    feature_workers = workers
+    profiler = None
+    if profile:
+        profiler = dataStructures.Feature.enableProfiling()
+        users = profiler.timeIterator('load_user', users)
+        # Features are only timed in this process
+        feature_workers = 1
+    features = pipeline.transform(gendered_users(users, gender_list), workers=feature_workers)
+    if profiler is not None:
+        profiler.disable()
+
+    print(features.shape)
+    print(pipeline.columns)
+    # Stratified k-fold cross-validation of every model, folds in parallel
+    results = crossValidation.cross_validate(features, gender_list, models=['svm', 'naivebayes'],
+                                             k=CV_FOLDS, workers=workers)
+    crossValidation.print_report(results)
+    if tag_store is not None:
+        print(tag_store.report())
+        tag_store.close()
+    if feature_store is not None:
+        print(feature_store.report())
+        feature_store.close()
+    if profiler is not None:
+        print(profiler.report())
+        prefix = profile[0].partition('=')[2]
+        if prefix:
+            profiler.toJSON(prefix + '.json')
+            profiler.dumpStats(prefix + '.prof')
+            profiler.dumpFolded(prefix + '.folded')
 
 if __name__ == '__main__':
     main()
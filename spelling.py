@@ -0,0 +1,53 @@
+'''
+spelling.py
+Misspelling detection against a precomputed WordNet vocabulary.
+
+A word is known when wordnet.synsets(word) is non-empty. Instead of running
+that morphological lookup for every token, the lowercased WordNet lemma names
+are loaded once into a frozenset; only words not found there (mostly inflected
+forms such as "dogs" or "running") fall back to wordnet.synsets, and those
+answers are memoized. The result is identical to calling wordnet.synsets.
+'''
+
+import functools
+
+import lexicons
+
+class MisspellingDetector:
+    '''
+    MisspellingDetector: decides whether tagged tokens are misspelled
+    Attributes:
+        cacheSize: number of fallback wordnet.synsets answers remembered
+    '''
+    def __init__(self, cacheSize=200000):
+        self.cacheSize = cacheSize
+        self._hasSynsets = functools.lru_cache(maxsize=cacheSize)(self._lookupSynsets)
+
+    @staticmethod
+    def _lookupSynsets(word):
+        from nltk.corpus import wordnet
+        return bool(wordnet.synsets(word))
+
+    # Returns True if WordNet knows word, directly or as an inflected form
+    def isKnown(self, word):
+        lower = word.lower()
+        if lower in lexicons.get('wordnet_lemmas'):
+            return True
+        return self._hasSynsets(lower)
+
+    # Same rule as CountMisspelledWords: unknown to WordNet, not a stopword
+    # and not tagged as a symbol
+    def isMisspelled(self, word, tag):
+        return tag != 'SYM' and word.lower() not in lexicons.get('stopwords') and not self.isKnown(word)
+
+    # tags: list of (word, tag) tuples
+    # Returns the number of misspelled words
+    def countMisspelled(self, tags):
+        count = 0
+        for (word, tag) in tags:
+            if self.isMisspelled(word, tag):
+                count += 1
+        return count
+
+# Process-wide detector shared by the features
+DETECTOR = MisspellingDetector()
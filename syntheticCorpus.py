@@ -0,0 +1,174 @@
+'''
+syntheticCorpus.py
+Writes made-up users in the load_data layout: one folder per user holding
+tweets.pickl, user.pickl, ngrams.pickl, replacements.pickl and
+transforms.pickl. Words follow a Zipf-like distribution and include the
+personal references, categorical and emotional words the features count, so
+every feature has something to do. Used by example.py and benchmark.py.
+
+Usage:
+    python syntheticCorpus.py folder [num_users] [tweets_per_user] [seed]
+'''
+
+import collections
+import os
+import pickle
+import random
+import string
+import sys
+
+import lexicons
+
+GENDERS = ['Male', 'Female']
+EDUCATIONS = ['high_school', 'some_college', 'graduate']
+LANGUAGES = ['English', 'Spanish', 'French', 'German', 'Hindi', 'Portuguese']
+REGIONS = ['Northeast', 'Midwest', 'South', 'West', 'Europe', 'Asia']
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+EMOTICONS = [':)', ':(', ':D', ':P', ':O', '=)', 'B)']
+PUNCTUATION = ['.', ',', '!', '?', '...', ':']
+
+# Tweet timestamps are in hundredths of a second, from 2013 to 2015
+FIRST_TIMESTAMP = 1356998400 * 100
+LAST_TIMESTAMP = 1451606400 * 100
+
+# Returns a list of made-up lowercase words
+def _vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(string.ascii_lowercase) for i in range(rng.randint(2, 9))))
+    return sorted(words)
+
+# Returns a function drawing words with probability falling off as 1/rank
+def _word_sampler(rng, words):
+    weights = [1.0 / (rank + 1) for rank in range(len(words))]
+    cumulative = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    def sample(count):
+        return rng.choices(words, cum_weights=cumulative, k=count)
+    return sample
+
+# Returns the word tokens of one tweet, with the optional extras mixed in
+def _tweet_words(rng, sample, settings, names):
+    words = sample(rng.randint(3, 18))
+    if rng.random() < settings['capital_rate']:
+        words[0] = words[0].capitalize()
+    if rng.random() < settings['hashtag_rate']:
+        words.insert(rng.randint(0, len(words)), '#' + rng.choice(words).strip('#@'))
+    if rng.random() < settings['mention_rate']:
+        words.insert(rng.randint(0, len(words)), '@' + rng.choice(names))
+    if rng.random() < settings['emoticon_rate']:
+        words.append(rng.choice(EMOTICONS))
+    if rng.random() < settings['punctuation_rate']:
+        words.append(rng.choice(PUNCTUATION))
+    if rng.random() < settings['retweet_rate']:
+        words = ['RT', '@' + rng.choice(names) + ':'] + words
+    return words
+
+# Returns the tweets.pickl entry for the given words
+def _tweet_entry(words, timestamp):
+    return {
+        'tokenized': words,
+        'time': timestamp,
+        'text': ' '.join(words),
+        'tokens': len(words),
+        'punc': sum(1 for word in words if all(c in string.punctuation for c in word)),
+    }
+
+# Returns the tweets.pickl dictionary of one user. Tweet ids are
+# first_id, first_id + 1, ...
+def _user_tweets(rng, sample, settings, names, num_tweets, first_id=0):
+    tweets = {}
+    timestamp = rng.randint(FIRST_TIMESTAMP, LAST_TIMESTAMP)
+    while len(tweets) < num_tweets:
+        # Gaps of seconds to days between tweets
+        timestamp += int(rng.expovariate(1.0 / (6 * 3600 * 100)))
+        if rng.random() < settings['multi_tweet_rate']:
+            # A thread of "(X of Y)" tweets a few seconds apart
+            total = rng.randint(2, 5)
+            for part in range(1, total + 1):
+                words = ['({0}'.format(part), 'of', '{0})'.format(total)] + _tweet_words(rng, sample, settings, names)
+                tweets[first_id + len(tweets)] = _tweet_entry(words, timestamp)
+                timestamp += rng.randint(100, 3000)
+        else:
+            tweets[first_id + len(tweets)] = _tweet_entry(_tweet_words(rng, sample, settings, names), timestamp)
+    return tweets
+
+# Returns (ngrams, replacements, transforms) dictionaries for one user's tweets
+def _text_dictionaries(rng, tweets):
+    ngrams = collections.Counter()
+    for entry in tweets.values():
+        words = [word.lower() for word in entry['tokenized']]
+        ngrams.update((word,) for word in words)
+        ngrams.update(zip(words, words[1:]))
+    words = [ngram[0] for ngram in ngrams if len(ngram) == 1]
+    replacements = dict((word, rng.randint(1, 5)) for word in rng.sample(words, min(10, len(words))))
+    transforms = dict((word + '->' + word[:-1], rng.randint(1, 3)) for word in rng.sample(words, min(5, len(words))))
+    return dict(ngrams), replacements, transforms
+
+# Input:
+# folder = folder the user folders are written to (created if missing).
+# num_users = number of users.
+# tweets_per_user = number of tweets of every user.
+# seed = seed of the random generator; the same arguments give the same corpus.
+# vocabulary_size = number of made-up words next to the lexicon words.
+# multi_tweet_rate = chance that a tweet starts an "(X of Y)" thread.
+# hashtag_rate, mention_rate, emoticon_rate, retweet_rate, capital_rate,
+# punctuation_rate = chance that a tweet has one of those.
+# Returns:
+# List of the user folders written.
+def generate_corpus(folder, num_users=100, tweets_per_user=200, seed=0, vocabulary_size=5000,
+                    multi_tweet_rate=0.02, hashtag_rate=0.2, mention_rate=0.3, emoticon_rate=0.1,
+                    retweet_rate=0.1, capital_rate=0.5, punctuation_rate=0.4):
+    settings = {
+        'multi_tweet_rate': multi_tweet_rate,
+        'hashtag_rate': hashtag_rate,
+        'mention_rate': mention_rate,
+        'emoticon_rate': emoticon_rate,
+        'retweet_rate': retweet_rate,
+        'capital_rate': capital_rate,
+        'punctuation_rate': punctuation_rate,
+    }
+    rng = random.Random(seed)
+    lexicon_words = (lexicons.PERSONAL_REFERENCES + lexicons.CATEGORICAL_WORDS +
+                     sorted(lexicons.get('emotional'))[:200])
+    words = lexicon_words + _vocabulary(rng, vocabulary_size)
+    rng.shuffle(words)
+    sample = _word_sampler(rng, words)
+    names = _vocabulary(rng, 200)
+
+    user_dirs = []
+    # Tweet ids are unique over the corpus, since tagStore keys POS tags by them
+    next_id = 0
+    for i in range(num_users):
+        user_dir = os.path.join(folder, 'user{0:06d}'.format(i))
+        os.makedirs(user_dir, exist_ok=True)
+        tweets = _user_tweets(rng, sample, settings, names, tweets_per_user, next_id)
+        next_id += len(tweets)
+        ngrams, replacements, transforms = _text_dictionaries(rng, tweets)
+        user_info = {
+            'Gender': rng.choice(GENDERS),
+            'Year': rng.randint(1950, 2000),
+            'Education': rng.choice(EDUCATIONS),
+            'Month': rng.choice(MONTHS),
+            'Languages': rng.sample(LANGUAGES, rng.randint(1, 3)),
+            'Regions': rng.sample(REGIONS, rng.randint(1, 3)),
+        }
+        for name, data in (('tweets.pickl', tweets), ('user.pickl', user_info), ('ngrams.pickl', ngrams),
+                           ('replacements.pickl', replacements), ('transforms.pickl', transforms)):
+            with open(os.path.join(user_dir, name), 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        user_dirs.append(user_dir)
+    return user_dirs
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    num_users = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    tweets_per_user = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    generate_corpus(sys.argv[1], num_users, tweets_per_user, seed)
@@ -0,0 +1,122 @@
+'''
+tagStore.py
+Persistent store of POS tags so re-runs over the same corpus skip tagging.
+Entries are keyed by tweet id and remember a hash of the tweet text; an entry
+whose text changed is treated as a miss and overwritten.
+
+Worker processes open the store read-only and hand the tags they computed
+back to the process that owns it, so only one process ever writes.
+'''
+
+import hashlib
+import json
+import os
+import sqlite3
+import urllib.request
+
+# Returns the hex sha1 of a tweet's text
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+class TagStore:
+    '''
+    TagStore: SQLite-backed cache of POS tags per tweet
+    Attributes:
+        path: path of the SQLite database file
+        hits: lookups answered from the store
+        misses: lookups with no usable entry (includes stale ones)
+        stale: lookups whose entry was for a different tweet text
+        readOnly: if True the database is never written; put() keeps the
+                  tags in pending for takePending()
+        pending: list of (tweet_id, text, tags) put into a read-only store
+    '''
+
+    COMMIT_EVERY = 1000 # Most puts between commits; featurePipeline also commits per batch
+
+    def __init__(self, path, readOnly=False):
+        self.path = path
+        self.readOnly = readOnly
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.pending = []
+        self._pending = 0
+        self._conn = None
+        if not readOnly:
+            self._connection().execute('CREATE TABLE IF NOT EXISTS tags ('
+                                       'tweet_id TEXT PRIMARY KEY, text_hash TEXT NOT NULL, tags TEXT NOT NULL)')
+
+    # Returns the open connection, opening it if close() was called
+    def _connection(self):
+        if self._conn is None:
+            if self.readOnly:
+                uri = 'file:{0}?mode=ro'.format(urllib.request.pathname2url(os.path.abspath(self.path)))
+                self._conn = sqlite3.connect(uri, uri=True, timeout=60)
+            else:
+                self._conn = sqlite3.connect(self.path, timeout=60)
+        return self._conn
+
+    # A copy opens its own connection to the same file
+    def __getstate__(self):
+        return {'path': self.path, 'readOnly': self.readOnly}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['readOnly'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Returns the stored list of (word, tag) tuples, or None if there is no
+    # entry for tweet_id with this text
+    def get(self, tweet_id, text):
+        row = self._connection().execute('SELECT text_hash, tags FROM tags WHERE tweet_id = ?',
+                                 (str(tweet_id),)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        if row[0] != text_hash(text):
+            self.stale += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [tuple(pair) for pair in json.loads(row[1])]
+
+    def put(self, tweet_id, text, tags):
+        if self.readOnly:
+            self.pending.append((tweet_id, text, tags))
+            return
+        self._connection().execute('INSERT OR REPLACE INTO tags (tweet_id, text_hash, tags) VALUES (?, ?, ?)',
+                           (str(tweet_id), text_hash(text), json.dumps([list(pair) for pair in tags])))
+        self._pending += 1
+        if self._pending >= self.COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        if self._conn is not None and not self.readOnly:
+            self._conn.commit()
+        self._pending = 0
+
+    # Commits and closes the connection; a later lookup opens it again
+    def close(self):
+        if self._conn is not None:
+            self.commit()
+            self._conn.close()
+            self._conn = None
+
+    # Returns the tags put into a read-only store since the last call
+    def takePending(self):
+        pending, self.pending = self.pending, []
+        return pending
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM tags').fetchone()[0]
+
+    # Returns a one-line summary of hit and miss counts
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = float(self.hits) / lookups if lookups else 0.0
+        return 'TagStore {0}: {1} hits, {2} misses ({3} stale), hit rate {4:.1%}'.format(
+            self.path, self.hits, self.misses, self.stale, rate)
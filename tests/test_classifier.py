@@ -0,0 +1,78 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import classifier
+
+class LabelsForTest(unittest.TestCase):
+
+    def test_class_numbers(self):
+        self.assertEqual(classifier.labels_for('gender', [0, 1, 1]).tolist(), ['Male', 'Female', 'Female'])
+        self.assertEqual(classifier.labels_for('education', [2, 0]).tolist(), ['graduate', 'high_school'])
+
+    def test_unknown_classes_are_empty(self):
+        self.assertEqual(classifier.labels_for('gender', [-1, 2, 0.5, 1.0]).tolist(), ['', '', '', 'Female'])
+
+    def test_age_bins(self):
+        self.assertEqual(classifier.labels_for('age', [1970, 1978, 1987, 1988, 1995]).tolist(),
+                         ['>=36', '26-35', '26-35', '<=25', '<=25'])
+
+    def test_labels_pass_through(self):
+        self.assertEqual(classifier.labels_for('gender', ['Female', 'Male']).tolist(), ['Female', 'Male'])
+
+    def test_unknown_output(self):
+        with self.assertRaises(ValueError):
+            classifier.labels_for('height', [0])
+
+class WritePredictionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.users = ['data/user{0}'.format(i) for i in range(7)]
+        self.predictions = {'gender': [i % 2 for i in range(7)], 'age': [1970 + 4 * i for i in range(7)]}
+        # The lines createTextFiles wrote one user at a time
+        self.expected = dict((filename, ['{0}\t{1}'.format(user, label) for user, label in
+                                         zip(self.users, classifier.labels_for(filename, Y_pred))])
+                             for filename, Y_pred in self.predictions.items())
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def read_lines(self, path, opener=open):
+        with opener(path, 'rt') as f:
+            return f.read().splitlines()
+
+    def test_text_files_in_chunks(self):
+        chunk = classifier.OUTPUT_CHUNK
+        classifier.OUTPUT_CHUNK = 3
+        try:
+            paths = classifier.write_predictions(self.users, self.predictions, folder=self.folder.name)
+        finally:
+            classifier.OUTPUT_CHUNK = chunk
+        self.assertEqual(sorted(os.path.basename(path) for path in paths), ['age.txt', 'gender.txt'])
+        for path in paths:
+            filename = os.path.basename(path)[:-len('.txt')]
+            self.assertEqual(self.read_lines(path), self.expected[filename])
+
+    def test_compressed(self):
+        paths = classifier.write_predictions(self.users, self.predictions, folder=self.folder.name, compress=True)
+        for path in paths:
+            filename = os.path.basename(path)[:-len('.txt.gz')]
+            self.assertEqual(self.read_lines(path, gzip.open), self.expected[filename])
+
+    def test_columnar(self):
+        [path] = classifier.write_predictions(self.users, self.predictions, folder=self.folder.name, columnar=True)
+        with np.load(path) as arrays:
+            self.assertEqual(arrays['user'].tolist(), self.users)
+            for filename, lines in self.expected.items():
+                self.assertEqual(arrays[filename].tolist(), [line.split('\t')[1] for line in lines])
+
+    def test_prediction_count_must_match(self):
+        with self.assertRaises(ValueError):
+            classifier.write_predictions(self.users[:-1], self.predictions, folder=self.folder.name)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import corpusCache
+import problemset3
+import syntheticCorpus
+
+# Returns what a User's loaders must agree on, tweet by tweet, with the
+# tweet ids passed through convert_id
+def user_summary(user, convert_id=lambda tweet_id: tweet_id):
+    return (user.gender, user.ngrams,
+            [(convert_id(tweet.id), tweet.tokens, tweet.rawText, tweet.timestamp, tweet.numTokens, tweet.numPunctuation)
+             for tweet in user.tweets])
+
+class CompiledCorpusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.folder = tempfile.TemporaryDirectory()
+        os.chdir(self.folder.name)
+        syntheticCorpus.generate_corpus('data', num_users=4, tweets_per_user=20)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+
+    # Compiles with relative paths, then reads the cache from another folder
+    def round_trip(self, convert_id=lambda tweet_id: tweet_id):
+        expected = [user_summary(user, convert_id) for user in problemset3.load_data('data')]
+        corpusCache.compile_corpus('data', 'cache')
+        cache = os.path.abspath('cache')
+        os.mkdir('elsewhere')
+        os.chdir('elsewhere')
+        self.assertEqual([user_summary(user) for user in problemset3.load_data(cache)], expected)
+        return corpusCache.CompiledCorpus(cache)
+
+    def test_round_trip_from_another_folder(self):
+        corpus = self.round_trip()
+        self.assertTrue(corpus.int_ids)
+        self.assertIsInstance(corpus.tweet(0).tokens, tuple)
+
+    def test_ids_that_are_not_int64(self):
+        path = os.path.join('data', 'user000001', 'tweets.pickl')
+        with open(path, 'rb') as f:
+            tweets = pickle.load(f)
+        first, second = list(tweets)[:2]
+        tweets['tweet-' + str(first)] = tweets.pop(first)
+        tweets[2 ** 70] = tweets.pop(second)
+        with open(path, 'wb') as f:
+            pickle.dump(tweets, f)
+        # One id that does not fit turns every id into a string
+        corpus = self.round_trip(str)
+        self.assertFalse(corpus.int_ids)
+        ids = [tweet.id for user in corpus for tweet in user.tweets]
+        self.assertIn(str(2 ** 70), ids)
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_interrupted_recompile_is_not_compiled(self):
+        corpusCache.compile_corpus('data', 'cache')
+        real_iter_users = problemset3.iter_users
+
+        def failing_iter_users(data_folder, workers=1):
+            for i, user in enumerate(real_iter_users(data_folder, workers=workers)):
+                if i == 2:
+                    raise KeyboardInterrupt
+                yield user
+        problemset3.iter_users = failing_iter_users
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                corpusCache.compile_corpus('data', 'cache')
+        finally:
+            problemset3.iter_users = real_iter_users
+        self.assertFalse(corpusCache.is_compiled('cache'))
+
+if __name__ == '__main__':
+    unittest.main()
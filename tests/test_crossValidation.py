@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import crossValidation
+import featurePipeline
+import problemset3
+import syntheticCorpus
+
+# Returns a small matrix whose labels the first column mostly decides
+def make_matrix(num_rows=60, seed=1):
+    rng = np.random.RandomState(seed)
+    X = rng.rand(num_rows, 8)
+    labels = np.where(X[:, 0] + rng.rand(num_rows) * 0.8 > 0.9, 'Female', 'Male')
+    return X, labels
+
+class StratifiedFoldsTest(unittest.TestCase):
+
+    def test_folds_split_every_class_evenly(self):
+        labels = ['Male'] * 30 + ['Female'] * 15
+        folds = crossValidation.stratified_folds(labels, k=5, seed=0)
+        self.assertEqual(len(folds), 5)
+        self.assertEqual(sorted(np.concatenate([test for train, test in folds]).tolist()), list(range(45)))
+        for train, test in folds:
+            self.assertEqual(sorted(train.tolist() + test.tolist()), list(range(45)))
+            self.assertEqual([np.asarray(labels)[test].tolist().count(label) for label in ('Male', 'Female')], [6, 3])
+
+class CrossValidateTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as folder:
+            data = os.path.join(folder, 'data')
+            syntheticCorpus.generate_corpus(data, num_users=30, tweets_per_user=20)
+            users = problemset3.load_data(data)
+        cls.X = featurePipeline.FeaturePipeline(problemset3.FEATURES).transform(users)
+        cls.labels = [user.gender for user in users]
+
+    def test_one_result_per_model_and_fold(self):
+        results = crossValidation.cross_validate(self.X, self.labels, models=['svm', 'naivebayes'], k=3)
+        self.assertEqual([result['model'] for result in results], ['svm', 'naivebayes'])
+        for result in results:
+            self.assertEqual([row['fold'] for row in result['folds']], [0, 1, 2])
+            scores = [row['accuracy'] for row in result['folds']]
+            self.assertTrue(all(0 <= score <= 1 for score in scores))
+            self.assertAlmostEqual(result['mean'], np.mean(scores))
+            self.assertAlmostEqual(result['std'], np.std(scores))
+
+    def test_workers_match_serial_run(self):
+        serial = crossValidation.cross_validate(self.X, self.labels, k=3, workers=1)
+        parallel = crossValidation.cross_validate(self.X, self.labels, k=3, workers=2)
+        self.assertEqual([[row['accuracy'] for row in result['folds']] for result in serial],
+                         [[row['accuracy'] for row in result['folds']] for result in parallel])
+
+class SeedTest(unittest.TestCase):
+
+    def test_estimators_get_the_seed(self):
+        estimator = crossValidation._seeded(crossValidation.classifier.MODELS['svm'](), 7)
+        self.assertEqual(estimator.get_params()['random_state'], 7)
+        # Models without a random_state are left alone
+        crossValidation._seeded(crossValidation.classifier.MODELS['naivebayes'](), 7)
+
+    def test_same_seed_same_folds(self):
+        X, labels = make_matrix()
+        runs = [crossValidation.cross_validate(X, labels, models=['svm', 'sgd'], k=3, workers=workers, seed=3)
+                for workers in (1, 1, 2)]
+        accuracies = [[[row['accuracy'] for row in result['folds']] for result in run] for run in runs]
+        self.assertEqual(accuracies[0], accuracies[1])
+        self.assertEqual(accuracies[0], accuracies[2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import random
+import tempfile
+import unittest
+
+import dataStructures
+import problemset3
+import syntheticCorpus
+
+# Input:
+# parts = list of (part, total) in tweet order.
+# Returns:
+# Sorted list of (size, parts_seen, complete) tuples, one per thread, built the
+# slow way: every "(X of Y)" tweet joins the first thread of size Y that is
+# still missing part X, otherwise it starts a new thread.
+def rebuild_threads(parts):
+    threads = []
+    for part, total in parts:
+        for size, seen in threads:
+            if size == total and part not in seen:
+                seen.add(part)
+                break
+        else:
+            threads.append((total, set([part])))
+    return sorted((size, len(seen), len(seen) == size) for size, seen in threads)
+
+def make_user(texts):
+    tweets = [dataStructures.Tweet(id=i, rawText=text, timestamp=i * 100) for i, text in enumerate(texts)]
+    return dataStructures.User(id='user', tweets=tweets)
+
+class MultiTweetThreadsTest(unittest.TestCase):
+
+    def test_interleaved_threads(self):
+        user = make_user(['(1 of 2) a', '(1 of 2) b', '(2 of 2) c', 'plain', '(3 of 3) d', '(2 of 2) e',
+                          '(2 of 2) f', '(0 of 2) bad', '(4 of 3) bad', '(1 of 3) g'])
+        feature = dataStructures.NumberOfMultiTweetsFeature(user)
+        self.assertEqual(sorted(feature.getThreads()), [(2, 1, False), (2, 2, True), (2, 2, True), (3, 2, False)])
+        self.assertEqual(feature.getValue(), 2)
+        self.assertEqual(feature.getStats()['NumberOfMultiTweetsFeature_threads'], 4)
+
+    def test_max_gap_splits_threads(self):
+        user = make_user(['(1 of 2) a', '(2 of 2) b'])
+        self.assertEqual(dataStructures.NumberOfMultiTweetsFeature(user, max_gap=50).getValue(), 0)
+        self.assertEqual(dataStructures.NumberOfMultiTweetsFeature(user, max_gap=100).getValue(), 1)
+
+    def test_matches_slow_rebuild_on_synthetic_corpus(self):
+        with tempfile.TemporaryDirectory() as folder:
+            data = os.path.join(folder, 'data')
+            syntheticCorpus.generate_corpus(data, num_users=10, tweets_per_user=100, multi_tweet_rate=0.2)
+            users = problemset3.load_data(data)
+        rng = random.Random(0)
+        for user in users:
+            # Shuffled and thinned, so threads interleave and some are incomplete
+            tweets = [tweet for tweet in user.tweets if rng.random() < 0.8]
+            rng.shuffle(tweets)
+            user.tweets = tweets
+            parts = []
+            for tweet in tweets:
+                match = dataStructures.MULTI_TWEET_PATTERN.match(tweet.rawText)
+                if match:
+                    parts.append((int(match.group(1)), int(match.group(2))))
+            self.assertTrue(parts)
+            feature = dataStructures.NumberOfMultiTweetsFeature(user)
+            self.assertEqual(sorted(feature.getThreads()), rebuild_threads(parts))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import analysisCache
+import dataStructures
+import featurePipeline
+import lexicons
+import tagStore
+
+# Returns users whose tweets have no emoticons, with ids unique over all tweets
+def make_users(num_users=6, tweets_per_user=4):
+    users = []
+    for i in range(num_users):
+        tweets = [dataStructures.Tweet(id=i * tweets_per_user + n, rawText='plain words {0} {1}'.format(i, n))
+                  for n in range(tweets_per_user)]
+        users.append(dataStructures.User(id='user{0}'.format(i), tweets=tweets))
+    return users
+
+# Lexicon that logs the pid of every process loading it
+def _logged_words():
+    with open(os.environ['LOGGED_WORDS_LOG'], 'a') as f:
+        f.write('{0}\n'.format(os.getpid()))
+    return ['plain']
+
+lexicons.REGISTRY.register('logged_words', _logged_words)
+
+class CountLoggedWords(dataStructures.Feature):
+    '''
+    CountLoggedWords: Counts the words of the tweet in the logged_words lexicon
+    '''
+    LEVEL = 'tweet'
+    LEXICONS = ('logged_words',)
+
+    def __init__(self, tweet):
+        self.tweet = tweet
+
+    def getKey(self):
+        return 'CountLoggedWords'
+
+    def getValue(self):
+        words = lexicons.get('logged_words')
+        return sum(1 for word in self.tweet.rawText.split(' ') if word in words)
+
+class TagStoreInWorkersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.store = tagStore.TagStore(os.path.join(self.folder.name, 'tags.sqlite'))
+        self.users = make_users()
+        # Stored tags that tagging the text could never give, so a count of
+        # them proves the tags were read from the store
+        for user in self.users:
+            for tweet in user.tweets:
+                self.store.put(tweet.id, tweet.rawText, [(':)', 'UH')])
+        self.store.commit()
+
+    def tearDown(self):
+        self.store.close()
+        self.folder.cleanup()
+
+    def test_pickled_pipeline_keeps_cache_settings(self):
+        analyses = analysisCache.AnalysisCache(maxsize=7, tagStore=self.store)
+        pipeline = featurePipeline.FeaturePipeline([dataStructures.CountEmoticon], analyses=analyses)
+        copy = pickle.loads(pickle.dumps(pipeline))
+        self.assertEqual(copy.analyses.maxsize, 7)
+        self.assertEqual(copy.analyses.tagStore.path, self.store.path)
+        self.assertTrue(copy.analyses.tagStore.readOnly)
+        self.assertEqual(len(copy.analyses), 0)
+
+    def test_workers_read_tag_store(self):
+        analyses = analysisCache.AnalysisCache(tagStore=self.store)
+        pipeline = featurePipeline.FeaturePipeline([dataStructures.CountEmoticon], analyses=analyses, batchSize=2)
+        X = pipeline.transform(self.users, workers=2, chunkSize=2)
+        self.assertEqual(X.toarray()[:, 0].tolist(), [4.0] * len(self.users))
+
+class TagStoreFromWorkersTest(unittest.TestCase):
+
+    def test_workers_fill_empty_store(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'tags.sqlite')
+            users = make_users()
+            serial = featurePipeline.FeaturePipeline([dataStructures.CountEmoticon]).transform(users)
+            store = tagStore.TagStore(path)
+            analyses = analysisCache.AnalysisCache(tagStore=store)
+            pipeline = featurePipeline.FeaturePipeline([dataStructures.CountEmoticon], analyses=analyses, batchSize=2)
+            X = pipeline.transform(users, workers=2, chunkSize=2)
+            self.assertEqual(X.toarray().tolist(), serial.toarray().tolist())
+            store.close()
+            # Every tweet's tags were handed back and committed by this process
+            with tagStore.TagStore(path) as reopened:
+                self.assertEqual(len(reopened), sum(len(user.tweets) for user in users))
+
+    def test_batches_commit_their_tags(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'tags.sqlite')
+            users = make_users()
+            store = tagStore.TagStore(path)
+            analyses = analysisCache.AnalysisCache(tagStore=store)
+            featurePipeline.FeaturePipeline([dataStructures.CountEmoticon], analyses=analyses).transform(users)
+            # Visible to, and not blocking, another connection before close()
+            with tagStore.TagStore(path) as other:
+                self.assertEqual(len(other), sum(len(user.tweets) for user in users))
+                other.put('extra', 'text', [('text', 'NN')])
+            store.close()
+
+class LexiconSnapshotTest(unittest.TestCase):
+
+    def test_workers_get_the_lexicons_loaded(self):
+        with tempfile.TemporaryDirectory() as folder:
+            os.environ['LOGGED_WORDS_LOG'] = os.path.join(folder, 'loads.txt')
+            # Registering again drops the lexicon, if an earlier test loaded it
+            lexicons.REGISTRY.register('logged_words', _logged_words)
+            pipeline = featurePipeline.FeaturePipeline([CountLoggedWords], batchSize=2)
+            X = pipeline.transform(make_users(), workers=2, chunkSize=2)
+            self.assertEqual(X.toarray()[:, 0].tolist(), [4.0] * 6)
+            with open(os.environ.pop('LOGGED_WORDS_LOG')) as f:
+                self.assertEqual(f.read().split(), [str(os.getpid())])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import incrementalTraining
+import modelArtifact
+import syntheticCorpus
+
+class ResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.data = os.path.join(self.folder.name, 'data')
+        syntheticCorpus.generate_corpus(self.data, num_users=12, tweets_per_user=10)
+        self.checkpoint = os.path.join(self.folder.name, 'model.pkl')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def train(self, checkpoint=None):
+        return incrementalTraining.train(self.data, ['Male', 'Female'], model='naivebayes', batch_size=3,
+                                         checkpoint=checkpoint, checkpoint_every=1)
+
+    # Trains with a checkpoint, stopping before the third batch is fitted
+    def interrupted_run(self):
+        fit_batch = incrementalTraining._fit_batch
+        calls = []
+
+        def interrupt(*args):
+            calls.append(args)
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            fit_batch(*args)
+
+        incrementalTraining._fit_batch = interrupt
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                self.train(self.checkpoint)
+        finally:
+            incrementalTraining._fit_batch = fit_batch
+
+    def test_resume_matches_uninterrupted_run(self):
+        expected = self.train()
+        self.interrupted_run()
+        self.assertEqual(modelArtifact.load(self.checkpoint)['checkpoint']['users_done'], 6)
+        resumed = self.train(self.checkpoint)
+        self.assertEqual(resumed['checkpoint']['users_done'], 12)
+        self.assertEqual(resumed['checkpoint']['batches_done'], expected['checkpoint']['batches_done'])
+        self.assertTrue(resumed['checkpoint']['finished'])
+        # MultinomialNB only sums its batches, so the same users give the same model
+        np.testing.assert_array_equal(resumed['model'].class_count_, expected['model'].class_count_)
+        np.testing.assert_array_equal(resumed['model'].feature_count_, expected['model'].feature_count_)
+
+    def test_finished_checkpoint_is_returned(self):
+        self.train(self.checkpoint)
+        artifact = self.train(self.checkpoint)
+        self.assertEqual(artifact['num_training_users'], 12)
+        self.assertTrue(artifact['checkpoint']['finished'])
+
+    def test_other_settings_are_rejected(self):
+        self.interrupted_run()
+        with self.assertRaises(ValueError):
+            incrementalTraining.train(self.data, ['Male', 'Female'], model='naivebayes', batch_size=4,
+                                      checkpoint=self.checkpoint)
+
+if __name__ == '__main__':
+    unittest.main()
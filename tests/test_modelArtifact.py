@@ -0,0 +1,73 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import modelArtifact
+import problemset3
+import syntheticCorpus
+
+class ScoreFolderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.data = os.path.join(self.folder.name, 'data')
+        syntheticCorpus.generate_corpus(self.data, num_users=8, tweets_per_user=20)
+        self.model_path = os.path.join(self.folder.name, 'model.pkl')
+        modelArtifact.save(modelArtifact.train(self.data, target='gender', model='svm'), self.model_path)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_data_folder_root_is_not_a_user(self):
+        user_dirs = [root for root, files in problemset3.iter_user_dirs(self.data)]
+        self.assertEqual(len(user_dirs), 8)
+        self.assertNotIn(self.data, user_dirs)
+        self.assertEqual(len(problemset3.load_data(self.data)), 8)
+
+    def test_one_prediction_per_user(self):
+        for workers in (1, 2):
+            user_ids, predictions = modelArtifact.score_folder(self.model_path, self.data, workers=workers)
+            self.assertEqual(user_ids, [user.id for user in problemset3.load_data(self.data)])
+            self.assertEqual(len(predictions), 8)
+            self.assertNotIn(self.data, user_ids)
+            self.assertTrue(set(predictions) <= {'Male', 'Female'})
+
+class SaveLoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.data = os.path.join(self.folder.name, 'data')
+        syntheticCorpus.generate_corpus(self.data, num_users=10, tweets_per_user=20)
+        self.path = os.path.join(self.folder.name, 'model.pkl')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_loaded_model_predicts_the_same(self):
+        for model in ('svm', 'naivebayes'):
+            artifact = modelArtifact.train(self.data, target='gender', model=model)
+            self.assertEqual(artifact['num_training_users'], 10)
+            self.assertEqual(artifact['features'], [feature.__name__ for feature in problemset3.FEATURES])
+            modelArtifact.save(artifact, self.path)
+            loaded = modelArtifact.load(self.path)
+            self.assertEqual(loaded['columns'], artifact['columns'])
+            self.assertEqual(loaded['labels'], artifact['labels'])
+            users = problemset3.load_data(self.data)
+            self.assertEqual(modelArtifact.predict(loaded, users), modelArtifact.predict(artifact, users))
+            self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_other_version_is_rejected(self):
+        artifact = modelArtifact.train(self.data)
+        artifact['version'] = modelArtifact.ARTIFACT_VERSION + 1
+        with open(self.path, 'wb') as f:
+            pickle.dump(artifact, f)
+        with self.assertRaises(ValueError):
+            modelArtifact.load(self.path)
+
+    def test_no_users(self):
+        artifact = modelArtifact.train(self.data)
+        self.assertEqual(modelArtifact.predict(artifact, []), ([], []))
+
+if __name__ == '__main__':
+    unittest.main()
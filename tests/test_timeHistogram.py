@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+import dataStructures
+import problemset3
+import syntheticCorpus
+import timeHistogram
+
+class TimeHistogramTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as folder:
+            data = os.path.join(folder, 'data')
+            syntheticCorpus.generate_corpus(data, num_users=6, tweets_per_user=50)
+            cls.users = problemset3.load_data(data)
+        # Tweets on bucket edges, and a user without tweets
+        edges = [0, 30 * 60 * 100 - 1, 30 * 60 * 100, 86399 * 100, 86400 * 100, 3 * 86400 * 100 + 45 * 60 * 100]
+        cls.users.append(dataStructures.User(id='edges', tweets=[dataStructures.Tweet(id=i, timestamp=timestamp)
+                                                                 for i, timestamp in enumerate(edges)]))
+        cls.users.append(dataStructures.User(id='empty', tweets=[]))
+
+    def test_matches_per_user_loop(self):
+        for minute_interval in (30, 45, 60, 7):
+            expected = [dataStructures.FrequencyOfTweetingFeature(user, minute_interval).getValue() for user in self.users]
+            self.assertEqual(timeHistogram.time_of_day_features(self.users, (minute_interval,)), expected)
+
+    def test_batch_values_match_get_value(self):
+        feature = dataStructures.FrequencyOfTweetingFeature
+        self.assertEqual(feature.batchValues(self.users), [feature(user).getValue() for user in self.users])
+
+    def test_day_of_week(self):
+        import datetime
+        [features] = timeHistogram.time_of_day_features(self.users[:1], (), weekday=True)
+        expected = dict(('DayOfWeek_{0}'.format(day), 0) for day in range(7))
+        for tweet in self.users[0].tweets:
+            day = datetime.datetime.utcfromtimestamp(tweet.timestamp / 100).weekday()
+            expected['DayOfWeek_{0}'.format(day)] += 1
+        self.assertEqual(features, expected)
+
+if __name__ == '__main__':
+    unittest.main()
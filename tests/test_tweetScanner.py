@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+
+import analysisCache
+import dataStructures
+import problemset3
+import syntheticCorpus
+import tweetScanner
+
+# Returns the counts of the Feature classes tweetScanner stands in for
+def feature_counts(user):
+    counts = {}
+    for key, feature in tweetScanner.SCANNED_FEATURES.items():
+        if feature.LEVEL == 'user':
+            counts[key] = feature(user).getValue()
+        elif feature.LEVEL == 'tweet':
+            counts[key] = sum(feature(tweet).getValue() for tweet in user.tweets)
+        else:
+            counts[key] = sum(feature(analysisCache.TweetAnalysis(tweet.rawText)).getValue() for tweet in user.tweets)
+    return counts
+
+class ScanMatchesFeaturesTest(unittest.TestCase):
+
+    def assertSameCounts(self, text):
+        user = dataStructures.User(tweets=[dataStructures.Tweet(rawText=text)])
+        self.assertEqual(tweetScanner.scan_text(text), feature_counts(user), repr(text))
+
+    def test_edge_cases(self):
+        for text in ['', 'RT @Bob: Help me at the GYM', 'XRT @a', '@RT @x via @y', 'RT @a @b_c`d',
+                     '#Hello #1 a#b # x', 'beer  beer\nbeer gym', 'x@y @@z @_a @1', 'ÉCOLE ǅ ß 𝐀',
+                     'wherefrom @x', 'retweet@x', 'help@ help']:
+            self.assertSameCounts(text)
+
+    def test_synthetic_corpus(self):
+        with tempfile.TemporaryDirectory() as folder:
+            syntheticCorpus.generate_corpus(folder, num_users=5, tweets_per_user=100, hashtag_rate=0.5,
+                                            mention_rate=0.5, retweet_rate=0.3, capital_rate=0.8)
+            users = [user for user in problemset3.load_data(folder) if user.tweets]
+        self.assertTrue(users)
+        for user in users:
+            self.assertEqual(tweetScanner.scan_user(user), feature_counts(user))
+
+    def test_scanned_count_is_not_registered(self):
+        self.assertNotIn('ScannedCount', dataStructures.Feature.registry)
+        self.assertEqual(dataStructures.Feature.registry['ScannedCounts'].LEVEL, 'user')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+'''
+timeHistogram.py
+Vectorized tweet-time histograms for many users at once. All timestamps are
+gathered into one array and bucketed with a single np.bincount, instead of
+converting each timestamp with datetime in a Python loop.
+'''
+
+import math
+
+import numpy as np
+
+import dataStructures
+
+SECONDS_PER_DAY = 24 * 60 * 60
+EPOCH_WEEKDAY = 3 # 1970-01-01 was a Thursday (Monday is 0)
+
+# Input:
+# users = list of User objects.
+# Returns:
+# (timestamps, user_index): float64 array of every tweet timestamp in seconds,
+# and an int64 array of the position in users each timestamp belongs to.
+def gather_timestamps(users):
+    counts = np.fromiter((len(user.tweets) for user in users), dtype=np.int64, count=len(users))
+    chunks = []
+    for user in users:
+        # Users from a compiled corpus already hold a timestamp column
+        column = getattr(user.tweets, 'timestamps', None)
+        if column is not None:
+            chunks.append(np.asarray(column(), dtype=np.float64))
+        else:
+            chunks.append(np.fromiter((tweet.timestamp for tweet in user.tweets), dtype=np.float64, count=len(user.tweets)))
+    timestamps = np.concatenate(chunks) if chunks else np.zeros(0)
+    timestamps = timestamps / dataStructures.FrequencyOfTweetingFeature.TIMESTAMP_DIVISOR
+    user_index = np.repeat(np.arange(len(users), dtype=np.int64), counts)
+    return timestamps, user_index
+
+# Input:
+# values = int array of bucket numbers, one per tweet.
+# user_index = int array of user positions, one per tweet.
+# num_users = number of users (rows).
+# num_buckets = number of buckets (columns).
+# Returns:
+# int64 array of shape (num_users, num_buckets) of tweet counts.
+def _histogram(values, user_index, num_users, num_buckets):
+    flat = np.bincount(user_index * num_buckets + values, minlength=num_users * num_buckets)
+    return flat.reshape(num_users, num_buckets)
+
+# Input:
+# timestamps, user_index = as returned by gather_timestamps.
+# num_users = number of users.
+# minute_interval = bucket width in minutes.
+# Returns:
+# int64 array (num_users, buckets) of tweets per time-of-day bucket (UTC),
+# bucket 0 starting at midnight.
+def time_of_day_histograms(timestamps, user_index, num_users, minute_interval=30):
+    num_buckets = int(math.ceil(24 * 60 / float(minute_interval)))
+    minute_of_day = np.floor(np.mod(timestamps, SECONDS_PER_DAY) / 60)
+    buckets = np.floor(minute_of_day / minute_interval).astype(np.int64)
+    return _histogram(buckets, user_index, num_users, num_buckets)
+
+# Input:
+# timestamps, user_index = as returned by gather_timestamps.
+# num_users = number of users.
+# Returns:
+# int64 array (num_users, 7) of tweets per weekday (UTC), Monday first.
+def day_of_week_histograms(timestamps, user_index, num_users):
+    days = np.floor(timestamps / SECONDS_PER_DAY).astype(np.int64)
+    weekdays = np.mod(days + EPOCH_WEEKDAY, 7)
+    return _histogram(weekdays, user_index, num_users, 7)
+
+# Input:
+# users = list of User objects.
+# minute_intervals = time-of-day bucket widths to compute, in minutes.
+# weekday = also compute day-of-week histograms.
+# Returns:
+# List with one dictionary per user. Time-of-day keys match
+# FrequencyOfTweetingFeature(user, minute_interval).getValue(); weekday keys
+# are DayOfWeek_0 (Monday) to DayOfWeek_6.
+def time_of_day_features(users, minute_intervals=(30,), weekday=False):
+    timestamps, user_index = gather_timestamps(users)
+    feature_dicts = [{} for user in users]
+    for minute_interval in minute_intervals:
+        prefix = dataStructures.FrequencyOfTweetingFeature(None, minute_interval).getKey()
+        histograms = time_of_day_histograms(timestamps, user_index, len(users), minute_interval)
+        names = [prefix + '_{0}'.format(x) for x in range(histograms.shape[1])]
+        for feature_dict, row in zip(feature_dicts, histograms.tolist()):
+            feature_dict.update(zip(names, row))
+    if weekday:
+        histograms = day_of_week_histograms(timestamps, user_index, len(users))
+        names = ['DayOfWeek_{0}'.format(x) for x in range(7)]
+        for feature_dict, row in zip(feature_dicts, histograms.tolist()):
+            feature_dict.update(zip(names, row))
+    return feature_dicts
@@ -0,0 +1,100 @@
+'''
+tweetScanner.py
+Counts capitals, hashtags, mentions, retweet markers and categorical words
+for a tweet in one call, instead of one Feature object and pass per count.
+Everything runs in C-level loops (str.isupper over map, the shared pattern
+constants, set lookups over map), and the mention, retweet and hashtag
+patterns are skipped for tweets without an '@' or '#'. benchmark.py times
+this against the Feature classes (scan:tweetScanner and scan:features).
+
+Counts are keyed by the getKey() of the Feature they stand in for and match
+that Feature's value. CountEmoticon and CountPunctuations count TextBlob
+tags and tokens rather than raw text, so they are not scanned here.
+'''
+
+import dataStructures
+import lexicons
+
+CAPITALIZATION_KEY = dataStructures.CapitalizationFeature(None).getKey()
+HASHTAGS_KEY = dataStructures.CountHashTags(None).getKey()
+MENTIONS_KEY = dataStructures.NumberOfTimesOthersMentionedFeature(None).getKey()
+RETWEET_KEY = dataStructures.CountRetweet(None).getKey()
+CATEGORICAL_KEY = dataStructures.CountCategoricalWords(None).getKey()
+
+SCAN_KEYS = [CAPITALIZATION_KEY, HASHTAGS_KEY, MENTIONS_KEY, RETWEET_KEY, CATEGORICAL_KEY]
+
+# Feature class each scanned key stands in for
+SCANNED_FEATURES = {
+    CAPITALIZATION_KEY: dataStructures.CapitalizationFeature,
+    HASHTAGS_KEY: dataStructures.CountHashTags,
+    MENTIONS_KEY: dataStructures.NumberOfTimesOthersMentionedFeature,
+    RETWEET_KEY: dataStructures.CountRetweet,
+    CATEGORICAL_KEY: dataStructures.CountCategoricalWords,
+}
+
+# Returns the counts of one tweet's raw text as a tuple in SCAN_KEYS order
+def _counts(text, categorical):
+    mentions = retweets = hashtags = 0
+    if '@' in text:
+        mentions = len(dataStructures.MENTION_PATTERN.findall(text))
+        retweets = len(dataStructures.RETWEET_PATTERN.findall(text))
+    if '#' in text:
+        hashtags = sum(1 for word in text.split() if dataStructures.HASHTAG_PATTERN.match(word))
+    return (sum(map(str.isupper, text)), hashtags, mentions, retweets,
+            sum(map(categorical.__contains__, text.split(' '))))
+
+# Input:
+# text = raw text of one tweet.
+# Returns:
+# Dictionary of SCAN_KEYS to counts for that tweet.
+def scan_text(text):
+    return dict(zip(SCAN_KEYS, _counts(text, lexicons.get('categorical'))))
+
+# Input:
+# user = User object whose tweets are scanned.
+# Returns:
+# Dictionary of SCAN_KEYS to counts summed over all the user's tweets.
+def scan_user(user):
+    categorical = lexicons.get('categorical')
+    counts = [_counts(tweet.rawText, categorical) for tweet in user.tweets]
+    if not counts:
+        return dict.fromkeys(SCAN_KEYS, 0)
+    return dict(zip(SCAN_KEYS, map(sum, zip(*counts))))
+
+class ScannedCounts(dataStructures.Feature):
+    '''
+    ScannedCounts: every scan_user count of a user in one Feature
+    Returns: dictionary of SCAN_KEYS to counts, which featurePipeline expands
+    into one column per key
+    '''
+    LEVEL = 'user'
+    LEXICONS = ('categorical',)
+
+    def __init__(self, user):
+        self.user = user
+
+    def getKey(self):
+        return 'ScannedCounts'
+
+    def getValue(self):
+        return scan_user(self.user)
+
+class ScannedCount:
+    '''
+    ScannedCount: getKey/getValue view of one count from a scan_text/scan_user
+    result. Not a Feature subclass, so it stays out of Feature.registry; use
+    ScannedCounts in a FeaturePipeline.
+    '''
+    def __init__(self, key, counts):
+        self.key = key
+        self.counts = counts
+
+    def getKey(self):
+        return self.key
+
+    def getValue(self):
+        return self.counts[self.key]
+
+# Returns one ScannedCount Feature per scanned key
+def scanned_features(counts):
+    return [ScannedCount(key, counts) for key in SCAN_KEYS]